@@ -0,0 +1,55 @@
+import dataclasses
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from qns.models.epr import MixedStateEntanglement
+from vlaware_qnode import Transmit, EprAccount
+from vl_entanglement import StandardEntangledPair
+
+'''
+Per object memory and creation time of the bookkeeping records, slotted vs. the former plain dataclasses
+'''
+
+def unslotted(cls: type) -> type:
+    '''
+    Plain dataclass with the same fields as cls
+    '''
+    fields = [(f.name, f.type, f) for f in dataclasses.fields(cls)]
+    return dataclasses.make_dataclass(f'Plain{cls.__name__}', [(name, tp, dataclasses.field(default=f.default)) for name, tp, f in fields])
+
+class PlainEntangledPair(MixedStateEntanglement):
+    def __init__(self, fidelity: float = 0.99, name: str | None = None):
+        super().__init__(fidelity, name=name)
+        self.src = None
+        self.dst = None
+        self.account = None
+
+def measure(factory: Callable[[], object], n: int) -> Tuple[float, float]:
+    '''
+    Bytes per object and microseconds per creation of n objects
+    '''
+    tracemalloc.start()
+    objs = [factory() for _ in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+
+    t = time.perf_counter()
+    for _ in range(n):
+        factory()
+    return size / n, (time.perf_counter() - t) / n * 1e6
+
+if __name__ == '__main__':
+    n = 200_000
+    PlainTransmit, PlainEprAccount = unslotted(Transmit), unslotted(EprAccount)
+    cases = [
+        ('Transmit', lambda: PlainTransmit(id=1, session=1, src=None, dst=None), lambda: Transmit(id=1, session=1, src=None, dst=None)),
+        ('EprAccount', lambda: PlainEprAccount(transmit_id=1, session_id=1, name='e1'), lambda: EprAccount(transmit_id=1, session_id=1, name='e1')),
+        ('EntangledPair', lambda: PlainEntangledPair(name='e1'), lambda: StandardEntangledPair(name='e1')),
+    ]
+    print(f'{"record":<15}{"plain B":>10}{"slots B":>10}{"plain us":>10}{"slots us":>10}')
+    for name, plain, slotted in cases:
+        plain_b, plain_us = measure(plain, n)
+        slots_b, slots_us = measure(slotted, n)
+        print(f'{name:<15}{plain_b:>10.0f}{slots_b:>10.0f}{plain_us:>10.3f}{slots_us:>10.3f}')
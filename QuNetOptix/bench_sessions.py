@@ -0,0 +1,52 @@
+import sys
+import time
+
+import qns.simulator.simulator
+import qns.utils.log as log
+from qns.simulator.pool import DefaultEventPool
+from qns.utils.rnd import set_seed
+from config import Config, Job
+from oracle import NetworkOracle
+from vl_topo import CustomDoubleStarTopology
+
+'''
+Heap size and event throughput of blocked sessions that poll (park_sessions=False) vs. sessions parked until a wakeup
+'''
+
+class PeakEventPool(DefaultEventPool):
+    '''
+    Event pool that keeps the largest heap it had
+    '''
+    def __init__(self, ts, te):
+        super().__init__(ts, te)
+        self.peak = 0
+
+    def add_event(self, event) -> bool:
+        added = super().add_event(event)
+        self.peak = max(self.peak, len(self.event_list))
+        return added
+
+qns.simulator.simulator.DefaultEventPool = PeakEventPool
+
+def measure(park_sessions: bool, te: float, memory_capacity: int, vlink_send_rate: float, vlinks):
+    topo = CustomDoubleStarTopology()
+    topo.memory_args[0]['capacity'] = memory_capacity # small buffers make the maintenance sessions block too
+    config = Config(ts=0, te=te, acc=1_000_000, topo=topo, job=Job.custom([('n0', 'n11'), ('n1', 'n10'), ('n2', 'n8')]), vls=False, vlinks=vlinks, send_rate=20, vlink_send_rate=vlink_send_rate, park_sessions=park_sessions)
+    oracle = NetworkOracle()
+    set_seed(1)
+    t = time.perf_counter()
+    df = oracle.run(config, loglvl=log.logging.WARNING).df
+    runtime = time.perf_counter() - t
+    return oracle._sim.total_events, oracle._sim.event_pool.peak, oracle._sim.total_events / oracle._sim.time_spend, runtime, df['success_count'][0]
+
+if __name__ == '__main__':
+    te = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    scenarios = [
+        ('vlink starved', 50000, 2, [('n2', 'n9')]), # distro sessions wait for vlinks
+        ('buffer full', 8, 200, [('n2', 'n9'), ('n3', 'n5'), ('n4', 'n7'), ('n6', 'n8')]), # maintenance of unused vlinks waits for room
+    ]
+    print(f'{"scenario":<15}{"mode":<6}{"events":>10}{"peak heap":>11}{"events/s":>11}{"run s":>8}{"success":>9}')
+    for name, memory_capacity, vlink_send_rate, vlinks in scenarios:
+        for park_sessions in [False, True]:
+            events, peak, rate, runtime, success = measure(park_sessions, te, memory_capacity, vlink_send_rate, vlinks)
+            print(f'{name:<15}{"park" if park_sessions else "poll":<6}{events:>10}{peak:>11}{rate:>11.0f}{runtime:>8.2f}{success:>9}')
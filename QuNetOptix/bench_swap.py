@@ -0,0 +1,34 @@
+import time
+
+from vl_entanglement import StandardEntangledPair, VLEntangledPair
+
+'''
+Per swap cost of the closed-form BellDiagonalPair.from_swap vs. swapping() plus the constructor the apps used before
+'''
+
+def swap_before(first: StandardEntangledPair, second: VLEntangledPair) -> StandardEntangledPair:
+    ne = first.swapping(second)
+    return StandardEntangledPair(fidelity=ne.a, b=ne.b, c=ne.c, d=ne.d)
+
+def swap_after(first: StandardEntangledPair, second: VLEntangledPair) -> StandardEntangledPair:
+    return StandardEntangledPair.from_swap(first, second)
+
+def store_before(epr: VLEntangledPair):
+    epr.a = 0.999
+    epr.normalized()
+
+def store_after(epr: VLEntangledPair):
+    epr.store_error_model(0)
+
+def per_call_us(func, args, n: int) -> float:
+    t = time.perf_counter()
+    for _ in range(n):
+        func(*args)
+    return (time.perf_counter() - t) / n * 1e6
+
+if __name__ == '__main__':
+    n = 200_000
+    first, second = StandardEntangledPair(fidelity=0.97), VLEntangledPair(fidelity=0.95)
+    print(f'{"op":<8}{"before us":>12}{"after us":>12}')
+    print(f'{"swap":<8}{per_call_us(swap_before, (first, second), n):>12.3f}{per_call_us(swap_after, (first, second), n):>12.3f}')
+    print(f'{"store":<8}{per_call_us(store_before, (second,), n):>12.3f}{per_call_us(store_after, (second,), n):>12.3f}')
@@ -36,6 +36,21 @@ class Config:
     vlinks: List[Tuple[str]] = None
     schedule_n_vlinks: Optional[int] = None
     session_seed: int = None
+    lazy_routing: bool = False
+    route_cache_size: int = 256
+    route_build_mode: str = 'bfs' # 'bfs', 'pairwise' or 'csgraph'
+    route_cache_dir: Optional[str] = None # on disk route tables keyed by topology and vlink fingerprint
+    vlink_seed: Optional[int] = None # louvain seed, seeded vlink plans are reproducible
+    vlink_plan_cache_dir: Optional[str] = None # on disk vlink plans keyed by topology fingerprint and seed
+    fast_forward: bool = False # analytic end-to-end distributions for throughput screening, see VLEnabledDistributionApp
+    park_sessions: bool = True # False polls blocked sessions every send period like before, for comparison
+
+    def same_network(self, other: 'Config') -> bool:
+        '''
+        Whether both configs build the same VLNetwork, so a network built for one can be reset and reused for the other
+        '''
+        fields = ['vlink_send_rate', 'vls', 'continuous_distro', 'vlinks', 'schedule_n_vlinks', 'lazy_routing', 'route_cache_size', 'route_build_mode', 'vlink_seed', 'fast_forward', 'park_sessions']
+        return self.topo is other.topo and self.job.session_count == other.job.session_count and all(getattr(self, f) == getattr(other, f) for f in fields)
 
     def __repr__(self):
         return f'Config(ts={self.ts}, te={self.te}, acc={self.acc}, send_rate={self.send_rate}, node_count={self.topo.nodes_number}, sessions={self.job.session_count}, job={self.job})'
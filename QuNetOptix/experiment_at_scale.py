@@ -27,6 +27,8 @@ if __name__ == '__main__':
     acc=1_000_000_000
     send_rate = 10
     vlink_send_rate_hz = 5*send_rate
+    route_cache_dir = 'data_scale/route_cache' # route tables are shared between rounds and runs of the same topology
+    vlink_plan_cache_dir = 'data_scale/vlink_plans' # louvain runs once per topology
 
     number_nodes = []
     sessions = []
@@ -96,6 +98,8 @@ if __name__ == '__main__':
             vlink_q_message_counts_agg = 0
 
             rounds = 5
+            oracle_plain = NetworkOracle() # networks are built in the first round and reset in later ones
+            oracle_vls = NetworkOracle()
             for j in range(rounds):
                 session_seed = i + j
                 sim_time = 20+(i/10)
@@ -105,7 +109,7 @@ if __name__ == '__main__':
                 # NO VLINKS
                 while True:
                     try:
-                        oracle = NetworkOracle()
+                        oracle = oracle_plain
                         config = Config(
                             ts=ts,
                             te=sim_time,
@@ -117,8 +121,10 @@ if __name__ == '__main__':
                             continuous_distro=True,
                             job = jobs,
                             session_seed=session_seed,
+                            route_build_mode='csgraph',
+                            route_cache_dir=route_cache_dir,
                         )
-                        metadata: SimData = oracle.run(config, loglvl=log.logging.INFO)
+                        metadata: SimData = oracle.run(config, loglvl=log.logging.INFO, reuse_network=True)
                         break
                     except KeyError:
                         print('\t\tfailed... try again')
@@ -136,9 +142,10 @@ if __name__ == '__main__':
 
 
                 # VLINKS
+                attempt = 0
                 while True:
                     try:
-                        oracle = NetworkOracle()
+                        oracle = oracle_vls
                         config = Config(
                             ts=ts,
                             te=te,
@@ -149,11 +156,16 @@ if __name__ == '__main__':
                             vls=True,
                             continuous_distro=True,
                             job = jobs,
-                            session_seed=session_seed
+                            session_seed=session_seed,
+                            route_build_mode='csgraph',
+                            route_cache_dir=route_cache_dir,
+                            vlink_seed=i + 1000 * attempt, # same vlinks in every round of this topology
+                            vlink_plan_cache_dir=vlink_plan_cache_dir,
                         )
-                        metadata: SimData = oracle.run(config, loglvl=log.logging.INFO)
+                        metadata: SimData = oracle.run(config, loglvl=log.logging.INFO, reuse_network=True)
                         break
                     except KeyError:
+                        attempt += 1 # seeded plan would fail the same way again
                         print('\t\tfailed... try again')
 
                 vlink_throughput_agg += metadata.throughput
@@ -10,13 +10,10 @@ from vl_network import VLNetwork
 from vlaware_qnode import VLAwareQNode
 from config import Config
 from metadata import SimData
-from vl_animation import GraphAnimation
 
 import os
 from typing import Any 
 import pandas as pd
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 from typing import Optional
 import networkx as nx
 
@@ -25,6 +22,7 @@ class NetworkOracle():
         self._sim: Optional[Simulator] = None
         self._net: Optional[VLNetwork] = None
         self._monitor: Optional[Monitor] = None
+        self._config: Optional[Config] = None # config the network was built for
         self.data = pd.DataFrame()
 
     def get_random_requests(self, graph: nx.Graph, n: int, seed: int = None):
@@ -42,7 +40,10 @@ class NetworkOracle():
         selected_pairs = random.choices(weighted_pairs, weights=weights, k=n)
         return selected_pairs
 
-    def run(self, config: Config, loglvl: int = log.logging.INFO) -> SimData:
+    def run(self, config: Config, loglvl: int = log.logging.INFO, reuse_network: bool = False) -> SimData:
+        '''
+        Simulate config, with reuse_network the network of the previous run is reset instead of rebuilt if it describes the same network
+        '''
 
         # Simulator
         self._sim = Simulator(config.ts, config.te, accuracy=config.acc)
@@ -53,8 +54,11 @@ class NetworkOracle():
 
         # Network
         metadata = SimData()
-        self._net: VLNetwork = VLNetwork(topo=config.topo, metadata=metadata, continuous_distro=config.continuous_distro, schedule_n_vlinks=config.schedule_n_vlinks, custom_vlinks=config.vlinks, vlink_send_rate=config.vlink_send_rate, vls=config.vls, session_count=config.job.session_count)
-        self._net.build_route()
+        if reuse_network and self._net is not None and self._config.same_network(config):
+            self._net.reset(metadata)
+        else:
+            self._net = self.build_network(config, metadata)
+            self._config = config
         if config.job.sessions is None:
             #self._net.random_requests(number=config.job.session_count, attr={'send_rate': config.send_rate})
             sessions = self.get_random_requests(self._net.physical_graph.graph, config.job.session_count, config.session_seed)
@@ -86,16 +90,16 @@ class NetworkOracle():
         self._monitor.add_attribution(name="node_count", calculate_func=lambda s, n, e: len(self._net.nodes))
 
         # performance primitives
-        self._monitor.add_attribution(name="success_count", calculate_func=lambda s, n, e: sum(app.success_count for req in n.requests for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'distro'))
-        self._monitor.add_attribution(name="vlink_success_count", calculate_func=lambda s, n, e: sum(app.success_count for req in n.vlinks for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'maint'))
-        self._monitor.add_attribution(name="send_count", calculate_func=lambda s, n, e: sum(app.send_count for req in n.requests for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'distro'))
-        self._monitor.add_attribution(name="vlink_send_count", calculate_func=lambda s, n, e: sum(app.send_count for req in n.vlinks for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'maint'))
-        self._monitor.add_attribution(name="remaining_mem_usage", calculate_func=lambda s, n, e: sum(app.memory._usage for node in n.nodes for app in node.apps if hasattr(app, 'memory')))
-        self._monitor.add_attribution(name="swap_count", calculate_func=lambda s, n, e: sum(app.swap_count for node in n.nodes for app in node.apps if hasattr(app, 'app_name') and app.app_name == 'distro'))
-        self._monitor.add_attribution(name="generation_latency_agg", calculate_func=lambda s, n, e: sum(app.generation_latency_agg for req in n.requests for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'distro'))
-        self._monitor.add_attribution(name="fidelity_agg", calculate_func=lambda s, n, e: sum(app.fidelity_agg for req in n.requests for app in req.src.apps if hasattr(app, 'app_name') and app.app_name == 'distro'))
-        self._monitor.add_attribution(name="q_message_count", calculate_func=lambda s, n, e: sum(app.q_message_count for node in n.nodes for app in node.apps if hasattr(app, 'app_name') and (app.app_name == 'distro' or app.app_name == 'maint')))
-        self._monitor.add_attribution(name="c_message_count", calculate_func=lambda s, n, e: sum(app.c_message_count for node in n.nodes for app in node.apps if hasattr(app, 'app_name') and (app.app_name == 'distro' or app.app_name == 'maint')))
+        self._monitor.add_attribution(name="success_count", calculate_func=lambda s, n, e: sum(req.src.distro_app.success_count for req in n.requests))
+        self._monitor.add_attribution(name="vlink_success_count", calculate_func=lambda s, n, e: sum(req.src.maint_app.success_count for req in n.vlinks))
+        self._monitor.add_attribution(name="send_count", calculate_func=lambda s, n, e: sum(req.src.distro_app.send_count for req in n.requests))
+        self._monitor.add_attribution(name="vlink_send_count", calculate_func=lambda s, n, e: sum(req.src.maint_app.send_count for req in n.vlinks))
+        self._monitor.add_attribution(name="remaining_mem_usage", calculate_func=lambda s, n, e: sum(app.memory._usage for node in n.nodes for app in (node.distro_app, node.maint_app)))
+        self._monitor.add_attribution(name="swap_count", calculate_func=lambda s, n, e: sum(node.distro_app.swap_count for node in n.nodes))
+        self._monitor.add_attribution(name="generation_latency_agg", calculate_func=lambda s, n, e: sum(req.src.distro_app.generation_latency_agg for req in n.requests))
+        self._monitor.add_attribution(name="fidelity_agg", calculate_func=lambda s, n, e: sum(req.src.distro_app.fidelity_agg for req in n.requests))
+        self._monitor.add_attribution(name="q_message_count", calculate_func=lambda s, n, e: sum(app.q_message_count for node in n.nodes for app in (node.distro_app, node.maint_app)))
+        self._monitor.add_attribution(name="c_message_count", calculate_func=lambda s, n, e: sum(app.c_message_count for node in n.nodes for app in (node.distro_app, node.maint_app)))
 
         #self._monitor.add_attribution(
             #name="gen_latencies", 
@@ -115,5 +119,11 @@ class NetworkOracle():
         metadata.df = self._monitor.data
         return metadata 
 
-    def entanglement_animation(self, filename: str, fps: int) -> GraphAnimation:
+    def build_network(self, config: Config, metadata: SimData) -> VLNetwork:
+        net: VLNetwork = VLNetwork(topo=config.topo, metadata=metadata, continuous_distro=config.continuous_distro, schedule_n_vlinks=config.schedule_n_vlinks, custom_vlinks=config.vlinks, vlink_send_rate=config.vlink_send_rate, vls=config.vls, session_count=config.job.session_count, lazy_routing=config.lazy_routing, route_cache_size=config.route_cache_size, route_build_mode=config.route_build_mode, route_cache_dir=config.route_cache_dir, vlink_seed=config.vlink_seed, vlink_plan_cache_dir=config.vlink_plan_cache_dir, fast_forward=config.fast_forward, park_sessions=config.park_sessions)
+        net.build_route()
+        return net
+
+    def entanglement_animation(self, filename: str, fps: int) -> 'GraphAnimation':
+        from vl_animation import GraphAnimation # pulls in matplotlib
         return GraphAnimation(filename, fps, self._net.physical_graph.graph, self._net.metadata.entanglement_log)
@@ -0,0 +1,18 @@
+import subprocess
+import sys
+import os
+
+IMPORT_BUDGET_S = 2.0 # qns (pandas) and networkx make up most of it
+HEAVY_MODULES = ['sklearn', 'node2vec', 'community', 'matplotlib', 'mpl_toolkits']
+
+def test_import_budget():
+    code = (
+        'import time, sys\n'
+        't = time.perf_counter()\n'
+        'import oracle, vl_topo\n'
+        'print(time.perf_counter() - t)\n'
+        f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n'
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.split('\n')
+    assert out[1] == '' # heavy modules are only imported where they are used
+    assert float(out[0]) < IMPORT_BUDGET_S
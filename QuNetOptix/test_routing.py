@@ -0,0 +1,477 @@
+from vl_topo import CustomDoubleStarTopology, CustomWaxmanTopology
+from vl_network import VLNetwork
+from vl_routing import VLEnabledRouteAlgorithm, NEXT_HOP_VIRTUAL
+from vlaware_qnode import Transmit, EprAccount
+from vl_entanglement import StandardEntangledPair, VLEntangledPair
+from metadata import SimData
+from oracle import NetworkOracle
+from config import Config, Job
+from qns.utils.rnd import set_seed
+from qns.simulator.simulator import Simulator
+from qns.simulator.event import func_to_event
+from qns.simulator.ts import Time
+import qns.utils.log as log
+
+import pytest
+import networkx as nx
+import random
+import dataclasses
+import numpy as np
+
+@pytest.fixture(params=[
+    (CustomDoubleStarTopology, {}),
+    (CustomWaxmanTopology, {'nodes_number': 50, 'seed': 50}),
+])
+def net(request) -> VLNetwork:
+    topo_cls, kwargs = request.param
+    return VLNetwork(
+        topo=topo_cls(**kwargs),
+        metadata=SimData(),
+        continuous_distro=False,
+        schedule_n_vlinks=None,
+        custom_vlinks=[('n2', 'n9')] if topo_cls is CustomDoubleStarTopology else None,
+        vlink_send_rate=1,
+        vls=topo_cls is not CustomDoubleStarTopology,
+        session_count=1
+    )
+
+def test_bfs_build_matches_pairwise(net: VLNetwork):
+    pairwise = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='pairwise')
+    bfs = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='bfs')
+    pairwise.build(net.nodes, net.qchannels)
+    bfs.build(net.nodes, net.qchannels)
+
+    for src in net.nodes:
+        for dst in net.nodes:
+            expected = pairwise.entry(src, dst)
+            entry = bfs.entry(src, dst)
+            assert entry.metric_physical == expected.metric_physical
+            assert entry.metric_virtual == expected.metric_virtual
+            assert len(entry.path_physical) == entry.metric_physical
+            assert len(entry.path_virtual) == entry.metric_virtual
+            if entry.path_virtual: # paths are connected and end in dst
+                assert entry.path_virtual[0][0][0] == src
+                assert entry.path_virtual[-1][0][1] == dst
+                assert all(a[0][1] == b[0][0] for a, b in zip(entry.path_virtual, entry.path_virtual[1:]))
+
+def test_csgraph_build_matches_bfs(net: VLNetwork):
+    bfs = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='bfs')
+    csgraph = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='csgraph')
+    bfs.build(net.nodes, net.qchannels)
+    csgraph.build(net.nodes, net.qchannels)
+
+    assert csgraph.table.dtype == np.int32
+    assert np.array_equal(csgraph.dist_physical, bfs.dist_physical)
+    assert np.array_equal(csgraph.dist_virtual, bfs.dist_virtual)
+    assert np.array_equal(csgraph.next_hop_physical == -1, bfs.next_hop_physical == -1)
+    assert_valid_next_hops(csgraph, net.vlink_graph.graph)
+
+def test_query_matches_entry(net: VLNetwork):
+    net.build_route()
+    for src in net.nodes:
+        for dst in net.nodes:
+            result = net.query_route(src, dst)
+            if src == dst:
+                assert result is None
+                continue
+            entry = net.route.entry(src, dst)
+            assert result.metric_physical == entry.metric_physical
+            assert result.metric_virtual == entry.metric_virtual
+            assert result.path_physical == tuple(hop[0][1] for hop in entry.path_physical)
+            assert result.path_virtual == tuple(hop[0][1] for hop in entry.path_virtual)
+            assert net.query_next_hop(src, dst) == (result.next_hop_physical, result.next_hop_virtual, result.vlink)
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_query_many_matches_query(net: VLNetwork, lazy):
+    route = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, lazy=lazy, cache_size=4)
+    route.build(net.nodes, net.qchannels)
+    n = len(net.nodes)
+    src_indices, dst_indices = np.divmod(np.arange(n * n), n)
+    batch = route.query_many(src_indices, dst_indices)
+    assert batch.metric_virtual.shape == (n * n,)
+
+    for i, (s, t) in enumerate(zip(src_indices, dst_indices)):
+        result = route.query(net.nodes[s], net.nodes[t])
+        if result is None:
+            assert batch.next_hop_virtual[i] == -1 and not batch.vlink[i]
+            continue
+        assert batch.metric_physical[i] == result.metric_physical
+        assert batch.metric_virtual[i] == result.metric_virtual
+        assert net.nodes[batch.next_hop_physical[i]] == result.next_hop_physical
+        assert net.nodes[batch.next_hop_virtual[i]] == result.next_hop_virtual
+        assert batch.vlink[i] == result.vlink
+
+    with pytest.raises(ValueError):
+        route.query_many([0, 1], [0])
+
+@pytest.mark.parametrize('cache_size', [1, 8, 1000])
+def test_lazy_matches_eager(net: VLNetwork, cache_size):
+    eager = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph)
+    lazy = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, lazy=True, cache_size=cache_size)
+    eager.build(net.nodes, net.qchannels)
+    lazy.build(net.nodes, net.qchannels)
+    assert len(lazy.row_cache) == 0
+
+    for src in net.nodes:
+        for dst in net.nodes:
+            assert lazy.entry(src, dst) == eager.entry(src, dst)
+            assert lazy.query(src, dst) == eager.query(src, dst)
+            assert lazy.query_next_hop(src, dst) == eager.query_next_hop(src, dst)
+            assert len(lazy.row_cache) <= cache_size
+
+def test_lazy_path_uses_source_tree_only(net: VLNetwork):
+    lazy = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, lazy=True, cache_size=1)
+    lazy.build(net.nodes, net.qchannels)
+    src, dst = net.nodes[0], net.nodes[-1]
+    result = lazy.query(src, dst)
+    assert list(lazy.row_cache) == [0]
+    assert lazy.query(src, dst) is result
+
+def test_query_memoized(net: VLNetwork):
+    net.build_route()
+    src, dst = net.nodes[0], net.nodes[-1]
+    result = net.query_route(src, dst)
+    assert net.query_route(src, dst) is result
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        result.vlink = not result.vlink
+
+    net.route.invalidate()
+    assert net.query_route(src, dst) is not result
+    assert net.query_route(src, dst) == result
+
+    for other in net.nodes: # bounded by cache_size
+        net.query_route(other, dst)
+    assert len(net.route.result_cache) <= net.route.cache_size
+
+def assert_valid_next_hops(route: VLEnabledRouteAlgorithm, graph):
+    for s, src in enumerate(route.nodes):
+        for t, dst in enumerate(route.nodes):
+            hops = [s] + route._path(NEXT_HOP_VIRTUAL, s, t)
+            assert len(hops) - 1 == route.dist_virtual[s, t]
+            assert all(graph.has_edge(route.nodes[u], route.nodes[v]) for u, v in zip(hops, hops[1:]))
+
+def test_incremental_vlink_update(net: VLNetwork):
+    net.build_route()
+    rebuilt = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph)
+    candidates = [(u, v) for u in net.nodes for v in net.nodes if u.name < v.name and not net.vlink_graph.graph.has_edge(u, v)]
+    added = [net.add_vlink(*candidates[i]) for i in range(0, len(candidates), max(1, len(candidates) // 5))]
+
+    rebuilt.build(net.nodes, net.qchannels)
+    assert np.array_equal(net.route.dist_virtual, rebuilt.dist_virtual)
+    assert np.array_equal(net.route.dist_physical, rebuilt.dist_physical)
+    assert_valid_next_hops(net.route, net.vlink_graph.graph)
+
+    for vlink in added:
+        net.remove_vlink(vlink)
+    rebuilt.build(net.nodes, net.qchannels)
+    assert np.array_equal(net.route.dist_virtual, rebuilt.dist_virtual)
+    assert_valid_next_hops(net.route, net.vlink_graph.graph)
+    assert all(vlink not in net.vlinks for vlink in added)
+
+def test_route_cache_dir(net: VLNetwork, tmp_path, monkeypatch):
+    built = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, cache_dir=str(tmp_path))
+    built.build(net.nodes, net.qchannels)
+    fingerprint = built.fingerprint()
+    cache_file = tmp_path / f'{fingerprint}.npy'
+    assert cache_file.exists()
+
+    loaded = VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, cache_dir=str(tmp_path))
+    monkeypatch.setattr(loaded, '_build_bfs', lambda: pytest.fail('cached table was rebuilt'))
+    loaded.build(net.nodes, net.qchannels)
+    assert np.array_equal(loaded.table, built.table)
+
+    # runtime vlinks change the fingerprint but never the file on disk
+    src, dst = next((u, v) for u in net.nodes for v in net.nodes if u.name < v.name and not net.vlink_graph.graph.has_edge(u, v))
+    loaded.add_vlink(src, dst)
+    assert loaded.fingerprint() != fingerprint
+    assert np.array_equal(np.load(cache_file), built.table)
+    assert loaded.dist_virtual[loaded.node_index[src], loaded.node_index[dst]] == 1
+
+def test_invalid_build_mode(net: VLNetwork):
+    with pytest.raises(ValueError):
+        VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='floyd')
+    with pytest.raises(ValueError):
+        VLEnabledRouteAlgorithm(net.physical_graph, net.vlink_graph, build_mode='csgraph', lazy=True)
+
+@pytest.fixture
+def star_net() -> VLNetwork:
+    net = VLNetwork(
+        topo=CustomDoubleStarTopology(),
+        metadata=SimData(),
+        continuous_distro=True,
+        schedule_n_vlinks=None,
+        custom_vlinks=[('n0', 'n2')], # physically adjacent
+        vlink_send_rate=5,
+        vls=False,
+        session_count=1
+    )
+    net.build_route()
+    return net
+
+def test_vlink_over_physical_edge(star_net: VLNetwork):
+    n0, n2, n5 = star_net.get_node('n0'), star_net.get_node('n2'), star_net.get_node('n5')
+    assert star_net.vlink_graph.graph.edges[n0, n2]['type'] == 'entanglement'
+
+    star_net.remove_vlink(star_net.vlinks[0]) # added at construction
+    assert star_net.vlink_graph.graph.edges[n0, n2]['type'] == 'physical'
+
+    vlink = star_net.add_vlink(n2, n0) # added at runtime
+    assert star_net.vlink_graph.graph.edges[n0, n2]['type'] == 'entanglement'
+    star_net.remove_vlink(vlink)
+    assert star_net.vlink_graph.graph.edges[n0, n2]['type'] == 'physical'
+    assert star_net.route.dist_virtual[star_net.route.node_index[n0], star_net.route.node_index[n5]] == 2
+
+    with pytest.raises(ValueError):
+        star_net.remove_vlink(vlink)
+    with pytest.raises(ValueError):
+        star_net.add_vlink(n0, n5, attr={})
+    assert vlink not in star_net.vlinks and len(n0.vlinks) == 0
+
+def test_shared_adjacency(star_net: VLNetwork):
+    physical, virtual = star_net.physical_graph, star_net.vlink_graph
+    assert virtual.indices is physical.indices and virtual.indptr is physical.indptr
+    assert physical._graph is None and virtual._graph is None # no networkx view unless asked for
+
+    n2, n9 = star_net.get_node('n2'), star_net.get_node('n9')
+    star_net.add_vlink(n2, n9)
+    assert virtual.edge_type(n2, n9) == 'entanglement' and physical.edge_type(n2, n9) is None
+    assert virtual.graph.edges[n2, n9] == {'type': 'entanglement', 'physical': False}
+    assert virtual.graph.number_of_edges() == physical.graph.number_of_edges() + 1
+    assert {frozenset(edge) for edge in physical.graph.edges} == {frozenset(q.node_list) for q in star_net.qchannels}
+
+def test_runtime_vlink_during_simulation(star_net: VLNetwork):
+    star_net.remove_vlink(star_net.vlinks[0])
+    n0, n2, n9, n11 = (star_net.get_node(name) for name in ['n0', 'n2', 'n9', 'n11'])
+    star_net.add_request(src=n2, dest=n9, attr={'send_rate': 5}) # distro session with the same endpoints as the vlink
+    star_net.add_request(src=n0, dest=n11, attr={'send_rate': 5})
+
+    sim = Simulator(0, 10, accuracy=1000000)
+    log.install(sim)
+    star_net.install(sim)
+    vlinks = []
+    sim.add_event(func_to_event(Time(sec=2), lambda: vlinks.append(star_net.add_vlink(n2, n9))))
+    sim.add_event(func_to_event(Time(sec=6), lambda: star_net.remove_vlink(vlinks[0])))
+    sim.run()
+
+    maint = [app for app in n2.apps if getattr(app, 'app_name', None) == 'maint'][0]
+    distro = [app for app in n0.apps if getattr(app, 'app_name', None) == 'distro'][0]
+    assert maint.success_count > 0 # maintenance was started at runtime
+    assert distro.success_count > 0
+
+    assert not any(session.get('request') is vlinks[0] for session in n2.session_registry.values())
+    assert any(session['app_name'] == 'distro' for session in n2.session_registry.values()) # distro session kept
+    assert len(n2.vlink_buf) == 0 and len(n9.vlink_buf) == 0
+    assert len(n2.waiting_for_vlink_buf) == 0 and len(n9.waiting_for_vlink_buf) == 0
+    assert not star_net.query_next_hop(n0, n11)[2]
+
+def test_select_vlinks_matches_all_pairs(net: VLNetwork):
+    graph = net.physical_graph.graph
+    distances = dict(nx.all_pairs_shortest_path_length(graph))
+    for seed in range(5):
+        centroid_nodes = random.Random(seed).sample(net.nodes, 8)
+
+        # reference selection on all pairs shortest path lengths
+        pairs = sorted(((u, v, distances[u][v]) for u in centroid_nodes for v in centroid_nodes if u is not v), key=lambda x: x[2], reverse=True)
+        expected, used_nodes = [], set()
+        for u, v, path_length in pairs:
+            if path_length >= 3 and u not in used_nodes and v not in used_nodes:
+                expected.append((u, v))
+                used_nodes.update([u, v])
+
+        assert net.select_vlinks(centroid_nodes) == expected
+
+def test_find_centroid_matches_center(net: VLNetwork):
+    graphs = [net.physical_graph.graph, nx.barabasi_albert_graph(300, 2, seed=1), nx.path_graph(7), nx.Graph([(0, 0)])]
+    communities = [(graph, list(graph)) for graph in graphs]
+    graph = net.physical_graph.graph
+    for seed in range(10): # connected communities of different size
+        start = random.Random(seed).choice(net.nodes)
+        communities.append((graph, list(nx.bfs_tree(graph, start, depth_limit=seed % 4 + 1))))
+
+    for graph, community in communities:
+        center = set(nx.center(graph.subgraph(community)))
+        assert net.find_centroid(graph, community) == next(v for v in community if v in center)
+        assert net.find_centroid(graph, community[::-1]) == next(v for v in community[::-1] if v in center)
+
+    with pytest.raises(nx.NetworkXError):
+        net.find_centroid(nx.Graph([(0, 1), (2, 3)]), [0, 1, 2, 3])
+
+def test_vlink_plan_cache(tmp_path, monkeypatch):
+    def waxman_net(**kwargs) -> VLNetwork:
+        return VLNetwork(topo=CustomWaxmanTopology(nodes_number=50, seed=50), metadata=SimData(), continuous_distro=False, schedule_n_vlinks=None,
+                         custom_vlinks=None, vlink_send_rate=1, vls=True, session_count=1, **kwargs)
+
+    seeded = waxman_net(vlink_seed=7)
+    assert [(v.src.name, v.dest.name) for v in waxman_net(vlink_seed=7).vlinks] == [(v.src.name, v.dest.name) for v in seeded.vlinks]
+
+    planned = waxman_net(vlink_seed=7, vlink_plan_cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob('*_7.json'))) == 1
+    monkeypatch.setattr('community.community_louvain.best_partition', lambda *args, **kwargs: pytest.fail('louvain was not skipped'))
+    cached = waxman_net(vlink_seed=7, vlink_plan_cache_dir=str(tmp_path))
+    assert [(v.src.name, v.dest.name) for v in cached.vlinks] == [(v.src.name, v.dest.name) for v in planned.vlinks] == [(v.src.name, v.dest.name) for v in seeded.vlinks]
+    assert cached.load_vlink_plan(7, str(tmp_path)) == planned.load_vlink_plan(7, str(tmp_path))
+
+def test_cchannels_created_on_demand(star_net: VLNetwork):
+    assert star_net.cchannels == []
+    n0, n2, n11 = star_net.get_node('n0'), star_net.get_node('n2'), star_net.get_node('n11')
+    star_net.add_request(src=n0, dest=n11, attr={'send_rate': 5})
+
+    sim = Simulator(0, 5, accuracy=1000000)
+    log.install(sim)
+    star_net.install(sim)
+    cchannel = n0.get_cchannel(n2) # created after install
+    assert cchannel._is_installed and n2.get_cchannel(n0) is cchannel
+    assert cchannel.delay_model is star_net.cchannel_args['delay']
+    sim.run()
+
+    n = len(star_net.nodes)
+    pairs = [frozenset(cchannel.node_list) for cchannel in star_net.cchannels]
+    assert len(pairs) == len(set(pairs)) < n * (n - 1) // 2 # one channel per communicating pair only
+    distro = [app for app in n0.apps if getattr(app, 'app_name', None) == 'distro'][0]
+    assert distro.success_count > 0
+
+def test_oracle_reuses_reset_network():
+    topo = CustomDoubleStarTopology()
+    def config(te) -> Config:
+        return Config(ts=0, te=te, acc=1000000, topo=topo, job=Job.custom([('n0', 'n11'), ('n2', 'n9')]), vls=False, vlinks=[('n2', 'n9')], send_rate=5, vlink_send_rate=5)
+
+    oracle = NetworkOracle()
+    set_seed(1)
+    fresh = oracle.run(config(5), loglvl=log.logging.WARNING).df
+    net = oracle._net
+    oracle.run(config(3), loglvl=log.logging.WARNING, reuse_network=True) # leave state behind for the reset
+
+    set_seed(1)
+    reused = oracle.run(config(5), loglvl=log.logging.WARNING, reuse_network=True).df
+    assert oracle._net is net and len(net.requests) == 2
+    assert reused.drop(columns=['time']).equals(fresh.drop(columns=['time']))
+    assert fresh['success_count'][0] > 0
+
+    other = Config(ts=0, te=5, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n0', 'n11')]), vls=False)
+    oracle.run(other, loglvl=log.logging.WARNING, reuse_network=True)
+    assert oracle._net is not net # different topology is rebuilt
+
+def test_log_trans_lazy(star_net: VLNetwork):
+    class Unprintable:
+        def __repr__(self):
+            raise AssertionError('formatted while debug logging is disabled')
+    app = [app for app in star_net.nodes[0].apps if getattr(app, 'app_name', None) == 'distro'][0]
+    log.logger.setLevel(log.logging.INFO)
+    app.log_trans('transmit %s', Unprintable(), transmit=Unprintable())
+
+def test_ids_deterministic_per_run():
+    topo = CustomDoubleStarTopology()
+    config = Config(ts=0, te=3, acc=1000000, topo=topo, job=Job.custom([('n0', 'n11')]), vls=False, send_rate=5)
+    oracle = NetworkOracle()
+    runs = []
+    for _ in range(2):
+        set_seed(1)
+        oracle.run(config, loglvl=log.logging.WARNING, reuse_network=True)
+        runs.append(sorted(oracle._net.metadata.distro_results.keys()))
+        assert all(isinstance(transmit_id, int) for transmit_id in runs[-1])
+    assert runs[0] == runs[1] and len(runs[0]) > 0 # allocator restarts with every run
+
+def test_registries_stay_bounded():
+    live = []
+    for te in [3, 10]:
+        config = Config(ts=0, te=te, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n0', 'n11')]), vls=False, send_rate=5)
+        oracle = NetworkOracle()
+        set_seed(1)
+        oracle.run(config, loglvl=log.logging.WARNING)
+        live.append(sum(node.live_entries for node in oracle._net.nodes))
+        assert all(node.trans_registry[-1] is None for node in oracle._net.nodes) # evicted keys still read as None
+    assert live[0] == live[1] # only in-flight transmits, independent of simulated time
+
+def test_slotted_records(star_net: VLNetwork):
+    n0, n1 = star_net.nodes[0], star_net.nodes[1]
+    a = Transmit(id=1, session=0, src=n0, dst=n1, alice=EprAccount(transmit_id=1))
+    b = Transmit(id=1, session=2, src=n1, dst=n0)
+    assert a == b and hash(a) == hash(b) and len({a, b}) == 1 # identity by id only
+    assert not hasattr(a, '__dict__') and not hasattr(a.alice, '__dict__')
+
+def test_app_handles_set_at_install(star_net: VLNetwork):
+    n0 = star_net.get_node('n0')
+    assert n0.distro_app is None and n0.maint_app is None
+    sim = Simulator(0, 1, 1000000)
+    star_net.install(sim)
+    for node in star_net.nodes:
+        assert node.distro_app.app_name == 'distro' and node.maint_app.app_name == 'maint'
+        assert node.distro_app in node.apps and node.maint_app in node.apps
+        assert node.distro_app.peer(n0) is n0.distro_app
+
+def test_from_swap_matches_swapping():
+    rng = random.Random(0)
+    for _ in range(100):
+        coeffs = [[rng.random() for _ in range(4)] for _ in range(2)]
+        old = [StandardEntangledPair(*coeffs[0]), VLEntangledPair(*coeffs[1])]
+        new = [StandardEntangledPair(*coeffs[0]), VLEntangledPair(*coeffs[1])]
+        ne = old[0].swapping(old[1])
+        expected = StandardEntangledPair(fidelity=ne.a, b=ne.b, c=ne.c, d=ne.d)
+        swapped = StandardEntangledPair.from_swap(*new, name='e1')
+        assert (swapped.a, swapped.b, swapped.c, swapped.d) == (expected.a, expected.b, expected.c, expected.d) # bit identical
+        assert type(swapped) is StandardEntangledPair and swapped.name == 'e1' and swapped.account is None
+        assert new[0].is_decoherenced and new[1].is_decoherenced and not swapped.is_decoherenced
+
+        new[1].store_error_model(0)
+        old[1].a = 0.999
+        old[1].normalized()
+        assert (new[1].a, new[1].b, new[1].c, new[1].d) == (old[1].a, old[1].b, old[1].c, old[1].d)
+
+@pytest.mark.parametrize('vlinks', [[], [('n2', 'n9')]])
+def test_fast_forward_matches_event_driven(vlinks):
+    results = {}
+    for fast_forward in [False, True]:
+        config = Config(ts=0, te=5, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n0', 'n11'), ('n1', 'n10')]), vls=False, vlinks=vlinks, send_rate=5, vlink_send_rate=2, fast_forward=fast_forward)
+        set_seed(1)
+        results[fast_forward] = NetworkOracle().run(config, loglvl=log.logging.WARNING).df
+    event, analytic = results[False], results[True]
+    assert analytic['success_count'][0] == event['success_count'][0] > 0 # both sessions share the vlink supply
+    assert analytic['swap_count'][0] == event['swap_count'][0]
+    assert analytic['generation_latency_agg'][0] == pytest.approx(event['generation_latency_agg'][0], rel=0.05)
+    assert analytic['fidelity_agg'][0] == pytest.approx(event['fidelity_agg'][0], rel=0.05)
+    if not vlinks:
+        assert analytic['c_message_count'][0] == event['c_message_count'][0]
+
+def test_maintenance_parks_on_full_buffer(monkeypatch):
+    import vl_topo
+    monkeypatch.setitem(vl_topo.memory_args[0], 'capacity', 8) # vlink_buf is full at 2
+    events, vlinks = [], []
+    for te in [5, 20]:
+        config = Config(ts=0, te=te, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([]), vls=False, vlinks=[('n2', 'n9')], vlink_send_rate=10)
+        oracle = NetworkOracle()
+        set_seed(1)
+        vlinks.append(oracle.run(config, loglvl=log.logging.WARNING).df['vlink_success_count'][0])
+        events.append(oracle._sim.total_events)
+        assert len(oracle._net.get_node('n2').maint_app.parked_sessions) == 1
+    assert vlinks == [2, 2] and events[0] == events[1] # no polling while parked
+
+    # consumed vlinks wake the parked session
+    config = Config(ts=0, te=10, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n0', 'n11')]), vls=False, vlinks=[('n2', 'n9')], send_rate=1, vlink_send_rate=10)
+    set_seed(1)
+    df = NetworkOracle().run(config, loglvl=log.logging.WARNING).df
+    assert df['vlink_success_count'][0] > 2 and df['success_count'][0] > 0
+
+def test_waiting_distro_session_is_woken():
+    counts = {}
+    for park_sessions in [False, True]:
+        config = Config(ts=0, te=10, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n2', 'n11')]), vls=False, vlinks=[('n2', 'n9')], send_rate=5, vlink_send_rate=2, park_sessions=park_sessions)
+        oracle = NetworkOracle()
+        set_seed(1)
+        df = oracle.run(config, loglvl=log.logging.WARNING).df
+        counts[park_sessions] = (df['success_count'][0], df['vlink_success_count'][0])
+    assert counts[True] == (20, 20) # every vlink is used
+    assert counts[False][0] < counts[True][0] # without wakeup the session stops after its first wait at src
+
+def test_batched_storage_per_hop(monkeypatch):
+    import vl_app
+    sizes = []
+    invoke = vl_app.MemoryBatchWriteRequestEvent.invoke
+    def counting_invoke(event):
+        sizes.append(len(event.qubits))
+        invoke(event)
+    monkeypatch.setattr(vl_app.MemoryBatchWriteRequestEvent, 'invoke', counting_invoke)
+    config = Config(ts=0, te=3, acc=1000000, topo=CustomDoubleStarTopology(), job=Job.custom([('n0', 'n11')]), vls=False, send_rate=5)
+    set_seed(1)
+    df = NetworkOracle().run(config, loglvl=log.logging.WARNING).df
+    assert df['success_count'][0] > 0
+    assert set(sizes) == {1, 2} # start and dst store one qubit, every other hop received and forward qubit in one access
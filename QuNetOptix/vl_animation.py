@@ -4,10 +4,8 @@ import re
 from vlaware_qnode import VLAwareQNode
 from typing import List, Tuple
 import networkx as nx
-import matplotlib.pyplot as plt
 import queue
 from dataclasses import dataclass
-from matplotlib.animation import FuncAnimation
 from enum import Enum
 from typing import Optional
 
@@ -65,7 +63,9 @@ class GraphAnimation():
         for edge in G.edges:
             self.graph.add_edge(edge[0].name, edge[1].name)
 
-        # viz
+        # viz, matplotlib is only imported when animating
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
         plt.style.use('dark_background')
         self.start_frame = True
         self.entanglement_edges = []
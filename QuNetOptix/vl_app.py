@@ -5,31 +5,39 @@ from qns.entity.memory import QuantumMemory
 from qns.network.requests import Request
 from qns.entity.node.app import Application
 from qns.models.core import QuantumModel
-from qns.entity.memory.event import MemoryReadRequestEvent, MemoryReadResponseEvent, MemoryWriteRequestEvent, MemoryWriteResponseEvent
+from qns.entity.memory.event import MemoryReadRequestEvent, MemoryReadResponseEvent
 from qns.entity.qchannel.qchannel import RecvQubitPacket
 from qns.entity.cchannel.cchannel import ClassicChannel, RecvClassicPacket, ClassicPacket
 from qns.entity.node import QNode
 from qns.simulator.simulator import Simulator
 from qns.simulator.event import func_to_event, Event
 from qns.simulator.ts import Time
+from qns.network.protocol.node_process_delay import NodeProcessDelayApp
+from qns.models.delay import DelayModel, NormalDelayModel, ConstantDelayModel
 import qns.utils.log as log
 
 from vlaware_qnode import VLAwareQNode, Transmit, EprAccount
 from vl_routing import RoutingResult
-from vl_entanglement import StandardEntangledPair, VLEntangledPair
+from vl_entanglement import BellDiagonalPair, StandardEntangledPair, VLEntangledPair
 from metadata import SimData, DistroResult
 from vl_network import VLNetwork
 from typing import Optional, Dict, Callable, Type, Any, Tuple, List
+from dataclasses import dataclass, field
+from collections import defaultdict
+import numpy as np
 import queue
 import random
 import simple_colors
-import uuid
+import os
+
+# trace every state transition with log_trans, VL_TRACE=0 or python -O strips the calls from the event handlers
+TRACE: bool = __debug__ and os.environ.get('VL_TRACE', '1') != '0'
 
 class RecvQubitOverVL(Event):
     '''
     Received by charlie after swapping over virtual link
     '''
-    def __init__(self, t: Optional[Time] = None, qubit: QuantumModel = None, src: VLAwareQNode = None, dest: VLAwareQNode = None, vlink_transmit_id: str = None, by: Optional[Any] = None):
+    def __init__(self, t: Optional[Time] = None, qubit: QuantumModel = None, src: VLAwareQNode = None, dest: VLAwareQNode = None, vlink_transmit_id: int = None, by: Optional[Any] = None):
         super().__init__(t=t, name=None, by=by)
         self.qubit = qubit
         self.vlink_transmit_id = vlink_transmit_id
@@ -40,6 +48,92 @@ class RecvQubitOverVL(Event):
         self.dest.handle(self)
 
 
+class MemoryBatchWriteRequestEvent(Event):
+    '''
+    Stores several qubits in one memory access, one delay draw for the whole batch
+    '''
+    def __init__(self, memory: QuantumMemory, qubits: List[QuantumModel], t: Optional[Time] = None, by: Optional[Any] = None):
+        super().__init__(t=t, name=None, by=by)
+        self.memory = memory
+        self.qubits = qubits
+
+    def invoke(self) -> None:
+        results = [self.memory.write(qubit) for qubit in self.qubits]
+        t = self.t + self.memory._simulator.time(sec=self.memory.delay_model.calculate())
+        self.memory._simulator.add_event(MemoryBatchWriteResponseEvent(node=self.memory.node, results=results, request=self, t=t, by=self.memory))
+
+
+class MemoryBatchWriteResponseEvent(Event):
+    '''
+    Write results of a batch, in the order of the requested qubits
+    '''
+    def __init__(self, node: QNode, results: List[bool], request: MemoryBatchWriteRequestEvent, t: Optional[Time] = None, by: Optional[Any] = None):
+        super().__init__(t=t, name=None, by=by)
+        self.node = node
+        self.results = results
+        self.request = request
+
+    def invoke(self) -> None:
+        self.node.handle(self)
+
+
+def sample_delays(models: List[DelayModel]) -> np.ndarray:
+    '''
+    One draw per entry, normal and constant delay models are drawn vectorised, one numpy call per distinct model
+    '''
+    draws = np.empty(len(models))
+    groups: Dict[DelayModel, List[int]] = defaultdict(list)
+    for i, model in enumerate(models):
+        groups[model].append(i)
+    for model, idx in groups.items():
+        if isinstance(model, NormalDelayModel):
+            draws[idx] = np.random.normal(model._mean_delay, model._std, len(idx))
+        elif isinstance(model, ConstantDelayModel):
+            draws[idx] = model._delay
+        else:
+            draws[idx] = [model.calculate() for _ in idx]
+    return draws
+
+@dataclass
+class VLinkSupply:
+    '''
+    Fast forward model of the vlinks between two nodes: the first is ready once established, then the maintenance
+    sessions add rate vlinks per second and buffer at most capacity, distributions take them first come first served
+    '''
+    src: VLAwareQNode
+    rate: float
+    capacity: float
+    epr: BellDiagonalPair # established vlink, its coefficients are only read by from_swap
+    t_last: float
+    tokens: float = 1.0
+
+    def take(self, t: float) -> float:
+        '''
+        Time at which a distribution arriving at t gets its vlink
+        '''
+        t = max(t, self.t_last)
+        tokens = min(self.capacity, self.tokens + (t - self.t_last) * self.rate)
+        if tokens < 1:
+            t += (1 - tokens) / self.rate
+            tokens = 1.0
+        self.tokens = tokens - 1
+        self.t_last = t
+        return t
+
+@dataclass
+class FastForwardResult:
+    '''
+    Analytic end-to-end distribution, see VLEnabledDistributionApp.fast_forward
+    '''
+    epr: BellDiagonalPair
+    success_time_s: float = 0.0 # success message arrives at src
+    wait_time_s: float = 0.0 # sim time where src started waiting for a vlink, 0 if it did not wait
+    swaps: int = 0
+    q_messages: int = 0
+    c_messages: int = 0
+    vlinks: List[VLinkSupply] = field(default_factory=list)
+
+
 class VLApp(Application):
     def __init__(self, name: str, init_fidelity: float):
         super().__init__()
@@ -47,7 +141,7 @@ class VLApp(Application):
         # members
         self.app_name: str = name
         self.init_fidelity = init_fidelity
-        self.entanglement_type: Type[QuantumModel] = None
+        self.entanglement_type: Type[BellDiagonalPair] = None
         if name != 'distro' and name != 'maint':
             raise ValueError('Invalid name')
 
@@ -69,12 +163,24 @@ class VLApp(Application):
         self.dst: Optional[VLAwareQNode] = None
 
         # communication
-        self.add_handler(self.MemoryWriteResponseHandler, [MemoryWriteResponseEvent])
+        self.add_handler(self.MemoryBatchWriteResponseHandler, [MemoryBatchWriteResponseEvent])
         self.add_handler(self.MemoryReadResponseHandler, [MemoryReadResponseEvent])
         self.add_handler(self.RecvQubitOverVLHandler, [RecvQubitOverVL])
         self.add_handler(self.RecvQubitHandler, [RecvQubitPacket])
         self.add_handler(self.RecvClassicPacketHandler, [RecvClassicPacket])
 
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear per run state and counters, the app is installed again with the next simulator
+        '''
+        self.waiting_for_vlink = False
+        self.vlinks_scheduled = 0
+        self.parked_sessions: List[int] = [] # maintenance sessions waiting for room in vlink_buf, distro sessions waiting for a vlink
+        self.src = None
+        self.dst = None
+
         # meta data
         self.c_message_count: int = 0
         self.q_message_count: int = 0
@@ -113,32 +219,63 @@ class VLApp(Application):
         self.own: VLAwareQNode = self._node
         self.memory: QuantumMemory = self.own.memories[0]
         self.net: VLNetwork = self.own.network
+        if self.app_name == 'distro':
+            self.own.distro_app = self
+        else:
+            self.own.maint_app = self
+
+        if self.app_name == 'maint' and self.net.fast_forward: # vlink supply is modelled by the distro apps, see VLinkSupply
+            return
 
         requests = self.own.requests if self.app_name == 'distro' else self.own.vlinks
         for request in requests:
             if self.own == request.src: # i am a sender
-                # save into session registry
-                session_id = uuid.uuid4().hex 
-                self.own.session_registry[session_id] = {'src': request.src, 'dst': request.dest}
-                request.dest.session_registry[session_id] = {'src': request.src, 'dst': request.dest} 
+                self.start_session(request, t=simulator.ts)
+
+    def peer(self, node: VLAwareQNode) -> 'VLApp':
+        '''
+        App of the same kind on another node
+        '''
+        return node.distro_app if self.app_name == 'distro' else node.maint_app
+
+    def start_session(self, request: Request, t: Optional[Time] = None):
+        # save into session registry
+        session_id = self.net.ids.next()
+        session = {'src': request.src, 'dst': request.dest, 'app_name': self.app_name, 'request': request}
+        self.own.session_registry[session_id] = session
+        request.dest.session_registry[session_id] = session
+
+        # start distro
+        self.send_rate = request.attr['send_rate'] 
+        event = func_to_event(t if t is not None else self._simulator.tc, self.start_ep_distribution, by=self, session_id=session_id)
+        self._simulator.add_event(event)
 
-                # start distro
-                self.send_rate = request.attr['send_rate'] 
-                event = func_to_event(simulator.ts, self.start_ep_distribution, by=self, session_id=session_id)
-                self._simulator.add_event(event)
+    def wake_parked(self):
+        '''
+        Restart parked sessions at the current time, they check again whether they can send
+        '''
+        parked, self.parked_sessions = self.parked_sessions, []
+        for session_id in parked:
+            event = func_to_event(self._simulator.tc, self.start_ep_distribution, by=self, session_id=session_id)
+            self._simulator.add_event(event)
 
-    def schedule_next_ep_distribution(self, session_id: str):
+    def schedule_next_ep_distribution(self, session_id: int):
         t = self._simulator.tc + Time(sec=1 / self.send_rate)
         event = func_to_event(t, self.start_ep_distribution, by=self, session_id=session_id)
         self._simulator.add_event(event)
 
-    def start_ep_distribution(self, session_id: str = None):
+    def start_ep_distribution(self, session_id: int = None):
         if session_id is None:
             raise ValueError('Session id required for new distribution')
+        if session_id not in self.own.session_registry: # session was removed at runtime
+            return
 
         if self.app_name == 'maint':
             if len(self.own.vlink_buf) >= self.memory.capacity / 4:
-                self.schedule_next_ep_distribution(session_id)
+                if self.net.park_sessions: # until _vlink consumes one
+                    self.parked_sessions.append(session_id)
+                else:
+                    self.schedule_next_ep_distribution(session_id)
                 return
             if self.net.schedule_n_vlinks is not None: # only distribute n_vlinks virtual links (for testing purposes)
                 if self.vlinks_scheduled >= self.net.schedule_n_vlinks:
@@ -149,6 +286,8 @@ class VLApp(Application):
         elif self.app_name == 'distro':
             if self.net.continuous_distro: # one distribution per session
                 if self.waiting_for_vlink:
+                    if self.net.park_sessions: # until _vlink or release_waiting clears waiting_for_vlink
+                        self.parked_sessions.append(session_id)
                     return # don't send new when there is an active distribution on that session
                 self.schedule_next_ep_distribution(session_id)
         else:
@@ -170,13 +309,13 @@ class VLApp(Application):
             wait_time_s=0
         )
         self.own.trans_registry[epr.account.transmit_id] = transmit
-        self.log_trans(f'start new ep distribution: {transmit.src} -> {transmit.dst} [epr={epr.name}]', transmit=transmit)
+        if TRACE:
+            self.log_trans('start new ep distribution: %s -> %s [epr=%s]', transmit.src, transmit.dst, epr.name, transmit=transmit)
 
-        self.own.storage_log[epr.name] = {epr.name: None}
-        write_request = MemoryWriteRequestEvent(memory=self.memory, qubit=epr,t=self._simulator.current_time,  by=(self, epr, transmit, None, 'start'))
+        write_request = MemoryBatchWriteRequestEvent(memory=self.memory, qubits=[epr], t=self._simulator.current_time, by=(self, transmit, None, 'start'))
         self._simulator.add_event(write_request)
 
-    def distribute_qubit_adjacent(self, transmit_id: str):
+    def distribute_qubit_adjacent(self, transmit_id: int):
         transmit = self.own.trans_registry.get(transmit_id)
         if transmit is None:
             return
@@ -184,28 +323,31 @@ class VLApp(Application):
         if epr is None: 
             return
 
-        routing_result: RoutingResult = self.net.query_route(self.own, transmit.dst)
-        if not routing_result:
+        next_hops = self.net.query_next_hop(self.own, transmit.dst)
+        if next_hops is None:
             raise Exception(f"{self}: Route error.")
+        next_hop_physical, next_hop_virtual, vlink = next_hops
 
-
-        next_hop: VLAwareQNode = routing_result.next_hop_physical
+        next_hop: VLAwareQNode = next_hop_physical
 
         # put into queue and exit if its vlink distro
-        if routing_result.vlink and self.app_name == 'distro':
-            next_hop: VLAwareQNode = routing_result.next_hop_virtual
+        if vlink and self.app_name == 'distro':
+            next_hop: VLAwareQNode = next_hop_virtual
             self.own.waiting_for_vlink_buf.append(transmit)
             if len(self.own.vlink_buf) == 0 and len(next_hop.vlink_buf) == 0:
                 transmit.wait_time_s = self._simulator.current_time.sec
                 self.own.trans_registry[transmit.id] = transmit
-                self.log_trans(f'waiting for vlink on {self.own.name} to {next_hop.name}\t[{epr}]', transmit=transmit)
+                if TRACE:
+                    self.log_trans('waiting for vlink on %s to %s\t[%s]', self.own.name, next_hop.name, epr, transmit=transmit)
                 self.waiting_for_vlink = True
                 return
-            self.log_trans(f'using available vlink on {self.own.name} to {next_hop.name}\t[{epr}]', transmit=transmit)
+            if TRACE:
+                self.log_trans('using available vlink on %s to %s\t[%s]', self.own.name, next_hop.name, epr, transmit=transmit)
             self._vlink(next_hop, None, None)
             return
 
-        self.log_trans(f'physical transmission of qubit {epr.name} to {next_hop}', transmit=transmit)
+        if TRACE:
+            self.log_trans('physical transmission of qubit %s to %s', epr.name, next_hop, transmit=transmit)
         qchannel: QuantumChannel = self.own.get_qchannel(next_hop)
         if qchannel is None:
             raise Exception(f"{self}: No such quantum channel.")
@@ -213,37 +355,34 @@ class VLApp(Application):
             self.q_message_count += 1
         qchannel.send(epr, next_hop=next_hop)
 
-    def MemoryWriteResponseHandler(self, node, event: MemoryWriteResponseEvent):
-        app, epr, transmit, src_node, command = event.request.by
+    def MemoryBatchWriteResponseHandler(self, node, event: MemoryBatchWriteResponseEvent):
+        app, transmit, src_node, command = event.request.by
         if app is not self:
             return
 
-        if self.own.storage_log[epr.name] is None: # previous storage failed and revoke already started
+        if transmit.revoked: # revoke already started while the batch was in flight
             return
 
-        storage_log_entry = self.own.storage_log[epr.name]
-
-        if event.result == False:
-            self.log_trans(f'failed storage of qubit {epr.name}', transmit=transmit)
-            for ep_name in storage_log_entry.keys():
-                self.own.storage_log[epr.name] = None
-                self.log_trans(f'read request for {ep_name}', transmit=transmit)
-                read_request = MemoryReadRequestEvent(memory=self.memory, key=ep_name, t=self._simulator.current_time, by=(app, epr, transmit, src_node, 'revoke'))
+        qubits: List[QuantumModel] = event.request.qubits
+        if not all(event.results):
+            if TRACE:
+                self.log_trans('failed storage of qubits %s', [epr.name for epr in qubits], transmit=transmit)
+            for epr in qubits: # read back the ones that were stored
+                if TRACE:
+                    self.log_trans('read request for %s', epr.name, transmit=transmit)
+                read_request = MemoryReadRequestEvent(memory=self.memory, key=epr.name, t=self._simulator.current_time, by=(app, epr, transmit, src_node, 'revoke'))
                 self._simulator.add_event(read_request)
             return
 
-        storage_log_entry[epr.name] = event.result
-        self.log_trans(f"stored qubit {epr.name}", transmit=transmit)
+        if TRACE:
+            self.log_trans("stored qubits %s", [epr.name for epr in qubits], transmit=transmit)
 
         if command == 'start': # start of distro
             self.send_count += 1
-            self.distribute_qubit_adjacent(epr.account.transmit_id)
+            self.distribute_qubit_adjacent(transmit.id)
             return
 
-        success: bool = all(status for status in storage_log_entry.values())
-        if success:
-            self.own.storage_log[epr.name] = None
-            self.send_control(src_node, transmit, 'swap', self.app_name)
+        self.send_control(src_node, transmit, 'swap', self.app_name)
 
     def MemoryReadResponseHandler(self, node, event: MemoryReadResponseEvent):
         app, epr, transmit, src_node, command = event.request.by
@@ -252,11 +391,12 @@ class VLApp(Application):
 
         if command == 'revoke':
             if event.result is not None:
-                self.log_trans(f'revoked qubit {event.result}', transmit=transmit)
+                if TRACE:
+                    self.log_trans('revoked qubit %s', event.result, transmit=transmit)
 
             if not transmit.revoked:
                 transmit.revoked = True
-                self.own.trans_registry[transmit.id] = None # clear
+                self.own.trans_registry.evict(transmit.id)
                 if self.own != transmit.src:
                     self.send_control(transmit.src, transmit, 'revoke', self.app_name)
             return
@@ -272,26 +412,20 @@ class VLApp(Application):
         )
         updated_transmit.alice.locB = self.own
         self.own.trans_registry[epr.account.transmit_id] = updated_transmit
-        self.log_trans(f"received qubit from {src_node.name}\t[{epr}]", transmit=updated_transmit)
+        if TRACE:
+            self.log_trans("received qubit from %s\t[%s]", src_node.name, epr, transmit=updated_transmit)
 
-        # async storage 
-        self.log_trans(f'storage request for {epr.name}', transmit=updated_transmit)
-        command = 'single'
-        storage_log = {epr.name: None}
+        # async storage, the received and the forward qubit share one memory access
+        qubits = [epr]
         if self.own is not epr.account.dst: # no forward epr if dst is reached
-            command = 'dual'
             forward_epr = self.generate_qubit(src=epr.account.src, dst=epr.account.dst, session_id=epr.account.session_id, transmit_id=epr.account.transmit_id) 
             updated_transmit.charlie = forward_epr.account 
-            self.log_trans(f'storage request for {forward_epr.name}', transmit=updated_transmit)
-            write_request_2 = MemoryWriteRequestEvent(memory=self.memory, qubit=forward_epr, t=self._simulator.current_time, by=(self, forward_epr, updated_transmit, src_node, command))
-            storage_log[forward_epr.name] = None
+            qubits.append(forward_epr)
+        if TRACE:
+            self.log_trans('storage request for %s', [qubit.name for qubit in qubits], transmit=updated_transmit)
 
-        write_request_1 = MemoryWriteRequestEvent(memory=self.memory, qubit=epr,t=self._simulator.current_time,  by=(self, epr, updated_transmit, src_node, command))
-        self.own.storage_log[epr.name] = storage_log
-        self._simulator.add_event(write_request_1)
-        if self.own is not epr.account.dst: # no forward epr if dst is reached
-            self.own.storage_log[forward_epr.name] = storage_log
-            self._simulator.add_event(write_request_2)
+        write_request = MemoryBatchWriteRequestEvent(memory=self.memory, qubits=qubits, t=self._simulator.current_time, by=(self, updated_transmit, src_node, 'store'))
+        self._simulator.add_event(write_request)
 
     def send_control(self, dst: VLAwareQNode, transmit: Transmit, control: str, app_name: str):
         # get sender channel 
@@ -304,7 +438,8 @@ class VLApp(Application):
             src=self.own, 
             dest=dst
         )
-        self.log_trans(f'sending \'{control}\' to {dst.name}', transmit=transmit)
+        if TRACE:
+            self.log_trans('sending \'%s\' to %s', control, dst.name, transmit=transmit)
         if self.app_name == 'distro':
             self.c_message_count += 1
         cchannel.send(classic_packet, next_hop=dst)
@@ -321,7 +456,8 @@ class VLApp(Application):
         cmd = msg['cmd']
         transmit = self.own.trans_registry[msg["transmit_id"]] 
 
-        self.log_trans(f'received \'{cmd}\' from {src_node.name}', transmit=transmit)
+        if TRACE:
+            self.log_trans('received \'%s\' from %s', cmd, src_node.name, transmit=transmit)
 
         # handle classical message
         self.control.get(cmd)(src_node, src_cchannel, transmit)
@@ -332,11 +468,9 @@ class VLApp(Application):
             # swap and manage new epr
             first: self.entanglement_type = self.memory.read(transmit.alice.name)
             second: self.entanglement_type = self.memory.read(transmit.charlie.name)
-            new_epr = first.swapping(second)
+            new_epr: self.entanglement_type = self.entanglement_type.from_swap(first, second, name=self.net.ids.name())
             self.swap_count = self.swap_count + 1
-            new_epr: self.entanglement_type = self.entanglement_type(fidelity=new_epr.a, b=new_epr.b, c=new_epr.c, d=new_epr.d)
 
-            new_epr.name = uuid.uuid4().hex
             new_epr.account = EprAccount(
                 transmit_id=transmit.id,
                 name=new_epr.name,
@@ -348,20 +482,21 @@ class VLApp(Application):
 
             # set new EP in Alice (request src)
             backward_node: VLAwareQNode = new_epr.account.locA
-            backward_node_app = backward_node.get_apps(type(self))[0]
+            backward_node_app = self.peer(backward_node)
 
             # set new EP in Charlie (next in path)
             forward_node: VLAwareQNode = new_epr.account.locB
-            forward_node_app = forward_node.get_apps(type(self))[0]
+            forward_node_app = self.peer(forward_node)
 
             # set alicea and charlie after swap
             backward_node_app.set_charlie(new_epr, first, second)
             forward_node_app.set_alice(new_epr, first, second)
 
             # clear for repeater node
-            self.own.trans_registry[transmit.id] = None
+            self.own.trans_registry.evict(transmit.id)
 
-            self.log_trans(f'performed swap (({backward_node.name}, {self.own.name}) - ({self.own.name}, {forward_node.name})) -> ({backward_node.name}, {forward_node.name})', transmit=transmit)
+            if TRACE:
+                self.log_trans('performed swap ((%s, %s) - (%s, %s)) -> (%s, %s)', backward_node.name, self.own.name, self.own.name, forward_node.name, backward_node.name, forward_node.name, transmit=transmit)
 
         # send next
         self.send_control(src_node, transmit, 'next', self.app_name)
@@ -376,6 +511,8 @@ class VLApp(Application):
                 self.net.metadata.distro_results[transmit.id] = DistroResult(dst_result=(transmit, result_epr))
 
             self.send_control(transmit.src, transmit, 'success', self.app_name)
+            if self.app_name == 'distro': # vlinks stay registered until they are consumed
+                self.own.trans_registry.evict(transmit.id)
             return
 
         self.distribute_qubit_adjacent(transmit.id)
@@ -385,8 +522,8 @@ class VLApp(Application):
 
         for ep in [transmit.alice, transmit.charlie]:
             if ep is not None:
-                self.own.storage_log[ep.name] = None
-                self.log_trans(f'read request for {ep.name}', transmit=transmit)
+                if TRACE:
+                    self.log_trans('read request for %s', ep.name, transmit=transmit)
                 read_request = MemoryReadRequestEvent(memory=self.memory, key=ep.name, t=self._simulator.current_time, by=(self, ep, transmit, src_node, 'revoke'))
                 self._simulator.add_event(read_request)
 
@@ -394,39 +531,24 @@ class VLApp(Application):
     def success(self, src_node: VLAwareQNode, src_cchannel: ClassicChannel, transmit: Transmit):
         if self.app_name == 'distro':
             result_epr: QuantumModel = self.memory.read(transmit.charlie.name)
-            self.log_trans(simple_colors.green(f"successful distribution of [result_epr={result_epr}]"), transmit=transmit, loglvl=log.logging.INFO)
-
-            # KPIs
+            if TRACE:
+                self.log_trans("successful distribution of [result_epr=%s]", result_epr, transmit=transmit, color=simple_colors.green, loglvl=log.logging.INFO)
             self.net.metadata.distro_results[transmit.id].src_result = (transmit, result_epr)
-            self.success_count += 1
-
-            wait_time = 0.0
-            if transmit.wait_time_s != 0:
-                wait_time = self._simulator.current_time.sec - transmit.wait_time_s
-
-            #gen_latency: float = self._simulator.current_time.sec - transmit.start_time_s 
-            gen_latency: float = self._simulator.current_time.sec - transmit.start_time_s - wait_time
-            self.gen_latencies.append(gen_latency)
-            self.generation_latency_agg += gen_latency
-
-            # max latency
-            if self.net.metadata.gl_max < gen_latency:
-                self.net.metadata.gl_max = gen_latency
-
-            # min latency
-            if self.net.metadata.gl_min == 0.0:
-                self.net.metadata.gl_min = gen_latency
-            elif self.net.metadata.gl_min > gen_latency:
-                self.net.metadata.gl_min = gen_latency
-
-            fidelity = result_epr.fidelity
-            self.fidelity_agg += fidelity
+            self.record_success(transmit, result_epr)
 
             # clear transmission
-            self.own.trans_registry[transmit.id] = None
+            self.own.trans_registry.evict(transmit.id)
+            return
+
+        if transmit.session not in self.own.session_registry: # vlink was removed while establishing
+            self.memory.read(transmit.charlie.name)
+            src_node.memories[0].read(transmit.charlie.name)
+            self.own.trans_registry.evict(transmit.id)
+            src_node.trans_registry.evict(transmit.id)
             return
 
-        self.log_trans(simple_colors.magenta(f'established vlink ({self.own.name}, {src_node.name})'), transmit=transmit, loglvl=log.logging.INFO)
+        if TRACE:
+            self.log_trans('established vlink (%s, %s)', self.own.name, src_node.name, transmit=transmit, color=simple_colors.magenta, loglvl=log.logging.INFO)
         self.success_count += 1
 
         self.own.vlink_buf.append(transmit)
@@ -450,6 +572,34 @@ class VLApp(Application):
             self.c_message_count += 1
             self.send_control(tgt, transmit, "vlink", "distro") 
 
+    def record_success(self, transmit: Transmit, result_epr: QuantumModel):
+        '''
+        KPIs of a finished distribution at its src
+        '''
+        self.success_count += 1
+
+        wait_time = 0.0
+        if transmit.wait_time_s != 0:
+            wait_time = self._simulator.current_time.sec - transmit.wait_time_s
+
+        #gen_latency: float = self._simulator.current_time.sec - transmit.start_time_s 
+        gen_latency: float = self._simulator.current_time.sec - transmit.start_time_s - wait_time
+        self.gen_latencies.append(gen_latency)
+        self.generation_latency_agg += gen_latency
+
+        # max latency
+        if self.net.metadata.gl_max < gen_latency:
+            self.net.metadata.gl_max = gen_latency
+
+        # min latency
+        if self.net.metadata.gl_min == 0.0:
+            self.net.metadata.gl_min = gen_latency
+        elif self.net.metadata.gl_min > gen_latency:
+            self.net.metadata.gl_min = gen_latency
+
+        fidelity = result_epr.fidelity
+        self.fidelity_agg += fidelity
+
     def _vlink(self, src_node: VLAwareQNode, src_cchannel: ClassicChannel, transmit: Transmit):
         if len(self.own.waiting_for_vlink_buf) == 0 or len(self.own.vlink_buf) == 0 : # someone else was faster
             return
@@ -490,12 +640,10 @@ class VLApp(Application):
         #second.account = tmp_acc
 
         # swap with vlink
-        new_epr = first.swapping(second)
+        new_epr: self.entanglement_type = self.entanglement_type.from_swap(first, second, name=self.net.ids.name())
         self.swap_count += 1
-        new_epr: self.entanglement_type = self.entanglement_type(fidelity=new_epr.a, b=new_epr.b, c=new_epr.c, d=new_epr.d)
         #new_epr: self.entanglement_type = self.entanglement_type(new_epr.distillation(self.entanglement_type()))
 
-        new_epr.name = uuid.uuid4().hex
         new_epr.account = EprAccount(
             transmit_id=transmit_to_teleport.id,
             name=new_epr.name,
@@ -508,38 +656,61 @@ class VLApp(Application):
 
         # set new EP in Alice (request src)
         backward_node: VLAwareQNode = transmit_to_teleport.src
-        backward_node_app: VLEnabledDistributionApp = backward_node.get_apps(VLEnabledDistributionApp)[0]
+        backward_node_app: VLEnabledDistributionApp = backward_node.distro_app
 
 
         # set new EP in Charlie (next in path)
         forward_node = vlink_transmit.dst if dir == 'forward' else vlink_transmit.src
-        forward_node_app: VLEnabledDistributionApp = forward_node.get_apps(VLEnabledDistributionApp)[0]
+        forward_node_app: VLEnabledDistributionApp = forward_node.distro_app
 
         # update forward and backward nodes
         forward_node_app.set_alice(new_epr, first, second, used_vlink=vlink_transmit)
         backward_node_app.set_charlie(new_epr, first, second, used_vlink=vlink_transmit)
-        self.log_trans(f'performed swap using vlink (({backward_node.name}, {self.own.name}) - ({self.own.name}, {forward_node.name})) -> ({backward_node.name}, {forward_node.name})', transmit=transmit_to_teleport)
+        if TRACE:
+            self.log_trans('performed swap using vlink ((%s, %s) - (%s, %s)) -> (%s, %s)', backward_node.name, self.own.name, self.own.name, forward_node.name, backward_node.name, forward_node.name, transmit=transmit_to_teleport)
 
         # clean up after vlink usage
         if backward_node != self.own:
             self.memory.read(transmit_to_teleport.charlie.name) # forward ep no longer of use because of vlink
         node_to_clear = vlink_transmit.src if self.own == vlink_transmit.dst else vlink_transmit.dst 
-        node_to_clear_app: VLEnabledDistributionApp = node_to_clear.get_apps(VLEnabledDistributionApp)[0] # clear other node of vlink
+        node_to_clear_app: VLEnabledDistributionApp = node_to_clear.distro_app # clear other node of vlink
         node_to_clear_app.memory.read(second.name)
-        vlink_transmit.dst.trans_registry[vlink_transmit.id]= None
-        vlink_transmit.src.trans_registry[vlink_transmit.id]= None
+        vlink_transmit.dst.trans_registry.evict(vlink_transmit.id)
+        vlink_transmit.src.trans_registry.evict(vlink_transmit.id)
+        for node in (vlink_transmit.src, vlink_transmit.dst): # room in both vlink buffers again
+            if node.maint_app.parked_sessions:
+                node.maint_app.wake_parked()
         self.waiting_for_vlink = False
+        if self.parked_sessions:
+            self.wake_parked()
 
         # treat this same way as physical qubit transmission by sending recvqubitevent
         send_event = RecvQubitOverVL(self._simulator.current_time, qubit=new_epr, src=backward_node, dest=forward_node, vlink_transmit_id=vlink_transmit.id, by=self) # no delay on vlinks, just use current time
         self._simulator.add_event(send_event)
 
 
-    def generate_qubit(self, src: VLAwareQNode, dst: VLAwareQNode, session_id: str,
-                       transmit_id: Optional[str] = None) -> QuantumModel:
-        epr = self.entanglement_type(name=uuid.uuid4().hex) 
+    def release_waiting(self):
+        '''
+        Continue transmits parked for a vlink whose route no longer uses one
+        '''
+        for transmit in list(self.own.waiting_for_vlink_buf):
+            next_hops = self.net.query_next_hop(self.own, transmit.dst)
+            if next_hops is not None and next_hops[2]:
+                continue
+            self.own.waiting_for_vlink_buf.remove(transmit)
+            if TRACE:
+                self.log_trans('vlink removed, continue physically', transmit=transmit)
+            self.distribute_qubit_adjacent(transmit.id)
+        if len(self.own.waiting_for_vlink_buf) == 0:
+            self.waiting_for_vlink = False
+            if self.parked_sessions:
+                self.wake_parked()
+
+    def generate_qubit(self, src: VLAwareQNode, dst: VLAwareQNode, session_id: int,
+                       transmit_id: Optional[int] = None) -> QuantumModel:
+        epr = self.entanglement_type(name=self.net.ids.name())
         epr.account = EprAccount(
-            transmit_id=transmit_id if transmit_id is not None else uuid.uuid4().hex,
+            transmit_id=transmit_id if transmit_id is not None else self.net.ids.next(),
             session_id=session_id,
             name=epr.name,
             src = src,
@@ -579,19 +750,144 @@ class VLApp(Application):
         # safe new epr
         self.memory.write(epr) # synchronous storage for realism 
 
-    def log_trans(self, str: str, transmit: Transmit = None, loglvl = log.logging.DEBUG):
-        if transmit is None:
-            log.debug(f'\t[{self.own.name}]\t{self.memory._usage}/{self.memory.capacity}\t{self.app_name}\tNone:\t{str}')
-        else:
-            log.debug(f'\t[{self.own.name}]\t{self.memory._usage}/{self.memory.capacity}\t{self.app_name}\t{transmit}:\t{str}')
+    def log_trans(self, msg: str, *args, transmit: Transmit = None, loglvl = log.logging.DEBUG, color: Optional[Callable[[str], str]] = None):
+        '''
+        Trace a state transition, msg is %-formatted with args only if debug output is enabled
+        '''
+        if not log.logger.isEnabledFor(log.logging.DEBUG):
+            return
+        if args:
+            msg = msg % args
+        if color is not None:
+            msg = color(msg)
+        log.debug('\t[%s]\t%s/%s\t%s\t%s:\t%s', self.own.name, self.memory._usage, self.memory.capacity, self.app_name, transmit, msg)
 
 
 class VLEnabledDistributionApp(VLApp):
     def __init__(self, init_fidelity: float = 0.99):
         super().__init__('distro', init_fidelity=init_fidelity)
-        self.entanglement_type: Type[QuantumModel] = StandardEntangledPair 
+        self.entanglement_type: Type[BellDiagonalPair] = StandardEntangledPair 
+
+    def start_ep_distribution(self, session_id: int = None):
+        if not self.net.fast_forward:
+            return super().start_ep_distribution(session_id)
+        if session_id not in self.own.session_registry: # session was removed at runtime
+            return
+        if self.net.continuous_distro:
+            self.schedule_next_ep_distribution(session_id)
+
+        session_src: VLAwareQNode = self.own.session_registry[session_id]['src']
+        session_dst: VLAwareQNode = self.own.session_registry[session_id]['dst']
+        start_time_s = self._simulator.current_time.sec
+        result = self.fast_forward(session_src, session_dst, start_time_s, self.entanglement_type)
+        transmit = Transmit(id=self.net.ids.next(), session=session_id, src=session_src, dst=session_dst, start_time_s=start_time_s, wait_time_s=result.wait_time_s)
+        self.send_count += 1
+        event = func_to_event(self._simulator.time(sec=result.success_time_s), self.fast_forward_success, by=self, transmit=transmit, result=result)
+        self._simulator.add_event(event)
+
+    def fast_forward_success(self, transmit: Transmit, result: FastForwardResult):
+        self.swap_count += result.swaps
+        self.q_message_count += result.q_messages
+        self.c_message_count += result.c_messages
+        for supply in result.vlinks: # established and consumed in one go
+            supply.src.maint_app.send_count += 1
+            supply.src.maint_app.success_count += 1
+        self.net.metadata.distro_results[transmit.id] = DistroResult(src_result=(transmit, result.epr), dst_result=(transmit, result.epr))
+        self.record_success(transmit, result.epr)
+
+    def fast_forward(self, src: VLAwareQNode, dst: VLAwareQNode, start_time_s: float, pair_type: Type[BellDiagonalPair], use_vlinks: bool = True) -> FastForwardResult:
+        '''
+        Analytic distribution along the current route: all channel and memory delays are drawn at once and the pairs are swapped
+        on their coefficients. Fidelity is exact without memory decoherence, with decoherence each swap partner is stored for its hop.
+        '''
+        hops: List[Tuple[VLAwareQNode, VLAwareQNode, bool]] = []
+        node = src
+        while node is not dst:
+            next_hops = self.net.query_next_hop(node, dst)
+            if next_hops is None:
+                raise Exception(f"{self}: Route error.")
+            next_hop_physical, next_hop_virtual, vlink = next_hops
+            next_hop = next_hop_virtual if vlink and use_vlinks else next_hop_physical
+            if next_hop is next_hop_virtual and not any(next_hop in (v.src, v.dest) for v in node.vlinks):
+                vlink = False # virtual route leaves over a physical edge
+                if node.get_qchannel(next_hop) is None:
+                    next_hop = next_hop_physical
+            hops.append((node, next_hop, vlink and use_vlinks))
+            node = next_hop
+
+        # same sequence of delays as the event driven protocol, the received and the forward qubit are written in one batch
+        models: List[DelayModel] = [src.memories[0].delay_model]
+        spans: List[Tuple[int, int, float]] = []
+        for node, next_hop, vlink in hops:
+            peer = src if vlink else node # swap and next are exchanged with the transmit src after a vlink swap
+            seq = [self.cchannel_delay_model(next_hop, peer), self.cchannel_delay_model(peer, next_hop)]
+            const = self.process_delay(peer, RecvClassicPacket) + self.process_delay(next_hop, RecvClassicPacket)
+            if not vlink:
+                seq.insert(0, node.get_qchannel(next_hop).delay_model)
+                const += self.process_delay(next_hop, RecvQubitPacket)
+            spans.append((len(models), len(seq), const))
+            models += [next_hop.memories[0].delay_model] + seq
+        models.append(self.cchannel_delay_model(dst, src)) # success
+        draws = sample_delays(models)
+
+        t = start_time_s + draws[0]
+        result = FastForwardResult(epr=pair_type())
+        for (node, next_hop, vlink), (i, n_seq, const) in zip(hops, spans):
+            hop_time = draws[i] + draws[i + 1:i + 1 + n_seq].sum() + const
+            if vlink:
+                supply = self.vlink_supply(node, next_hop)
+                t_vlink = supply.take(t)
+                if t_vlink > t:
+                    result.epr.store_error_model(t=t_vlink - t, decoherence_rate=node.memories[0].decoherence_rate) # parked until the vlink is there
+                    if node is src and result.wait_time_s == 0.0: # like the protocol, which only marks the transmit record at src
+                        result.wait_time_s = t
+                t = t_vlink
+                result.vlinks.append(supply)
+                result.epr = pair_type.from_swap(result.epr, supply.epr)
+                result.swaps += 1
+            else:
+                qchannel: QuantumChannel = node.get_qchannel(next_hop)
+                forward = result.epr if node is src else pair_type()
+                forward.transfer_error_model(qchannel.length, qchannel.decoherence_rate, **qchannel.transfer_error_model_args)
+                if node is not src:
+                    for pair in (result.epr, forward): # both wait in the memory of node until the swap
+                        pair.store_error_model(t=hop_time, decoherence_rate=node.memories[0].decoherence_rate)
+                    result.epr = pair_type.from_swap(result.epr, forward)
+                    result.swaps += 1
+                result.q_messages += 1
+            result.c_messages += 2
+            t += hop_time
+
+        result.epr.store_error_model(t=draws[-1], decoherence_rate=dst.memories[0].decoherence_rate)
+        result.success_time_s = t + draws[-1] + self.process_delay(src, RecvClassicPacket)
+        result.c_messages += 1
+        return result
+
+    def vlink_supply(self, node: VLAwareQNode, other: VLAwareQNode) -> VLinkSupply:
+        '''
+        Supply of the vlinks between two nodes, shared by all sessions routed over them
+        '''
+        key = frozenset((node, other))
+        supply: Optional[VLinkSupply] = self.net.vlink_supply.get(key)
+        if supply is None:
+            vlinks = [v for v in self.net.vlinks if {v.src, v.dest} == key]
+            src, dst = vlinks[0].src, vlinks[0].dest
+            established = self.fast_forward(src, dst, self._simulator.ts.sec, src.maint_app.entanglement_type, use_vlinks=False)
+            supply = VLinkSupply(src=src, rate=sum(v.attr['send_rate'] for v in vlinks), capacity=src.memories[0].capacity / 4, epr=established.epr, t_last=established.success_time_s)
+            self.net.vlink_supply[key] = supply
+        return supply
+
+    def cchannel_delay_model(self, src: VLAwareQNode, dst: VLAwareQNode) -> DelayModel:
+        cchannel = src.cchannel_map.get(dst)
+        if cchannel is not None:
+            return cchannel.delay_model
+        delay = self.net.cchannel_args.get('delay', 0) # channel is not connected yet, same arguments as connect_cchannel
+        return delay if isinstance(delay, DelayModel) else ConstantDelayModel(delay=delay)
+
+    def process_delay(self, node: VLAwareQNode, event_type: Type[Event]) -> float:
+        return sum(app.delay for app in node.apps if isinstance(app, NodeProcessDelayApp) and (app.delay_event_list is None or issubclass(event_type, app.delay_event_list)))
 
 class VLMaintenanceApp(VLApp):
     def __init__(self, init_fidelity: float = 1):
         super().__init__('maint', init_fidelity=init_fidelity)
-        self.entanglement_type: Type[QuantumModel] = VLEntangledPair 
\ No newline at end of file
+        self.entanglement_type: Type[BellDiagonalPair] = VLEntangledPair 
\ No newline at end of file
@@ -5,34 +5,67 @@ import numpy as np
 
 from qns.utils.rnd import get_rand
 
-class VLEntangledPair(MixedStateEntanglement):
+class BellDiagonalPair(MixedStateEntanglement):
     '''
-    Custom entanglement for maintenance app
+    Bell-diagonal pair with bookkeeping for the apps, swaps on the four coefficients directly
     '''
+    # the qns base classes have no slots, listing their attributes here too means the instance __dict__ is never created
+    __slots__ = ('fidelity', 'b', 'c', 'd', 'name', 'is_decoherenced', 'src', 'dst', 'account')
+
     def __init__(self, fidelity: float = 0.99, b: float | None = None, c: float | None = None, d: float | None = None, name: str | None = None):
         super().__init__(fidelity, b, c, d, name)
         self.src = None
         self.dst = None
         self.account: EprAccount = None
 
+    @classmethod
+    def from_swap(cls, first: MixedStateEntanglement, second: MixedStateEntanglement, name: Optional[str] = None) -> 'BellDiagonalPair':
+        '''
+        Same result as cls(fidelity=ne.a, b=ne.b, c=ne.c, d=ne.d) with ne = first.swapping(second), without the intermediate pair
+        '''
+        a1, b1, c1, d1 = first.fidelity, first.b, first.c, first.d
+        a2, b2, c2, d2 = second.fidelity, second.b, second.c, second.d
+        first.is_decoherenced = True
+        second.is_decoherenced = True
+
+        a = a1*a2 + b1*b2 + c1*c2 + d1*d2
+        b = a1*b2 + b1*a2 + c1*d2 + d1*c2
+        c = a1*c2 + b1*d2 + c1*a2 + d1*b2
+        d = a1*d2 + b1*c2 + c1*d2 + d1*a2 # c1*d2 as in qns swapping()
+        for _ in range(2): # swapping() and the constructor both normalize
+            total = a + b + c + d
+            a, b, c, d = a/total, b/total, c/total, d/total
+
+        epr = cls.__new__(cls)
+        epr.fidelity, epr.b, epr.c, epr.d = a, b, c, d
+        epr.name = name
+        epr.is_decoherenced = False
+        epr.src = None
+        epr.dst = None
+        epr.account = None
+        return epr
+
+class VLEntangledPair(BellDiagonalPair):
+    '''
+    Custom entanglement for maintenance app
+    '''
+    __slots__ = ()
+
     def store_error_model(self, t: float, decoherence_rate: Optional[float] = 0, **kwargs):
-        self.a = 0.999
-        self.normalized()
+        self.reset_fidelity()
 
     def transfer_error_model(self, length: float, decoherence_rate: Optional[float] = 0, **kwargs):
-        self.a = 0.999
-        self.normalized()
+        self.reset_fidelity()
 
+    def reset_fidelity(self):
+        # a = 0.999 followed by normalized(), inlined
+        total = 0.999 + self.b + self.c + self.d
+        self.fidelity, self.b, self.c, self.d = 0.999/total, self.b/total, self.c/total, self.d/total
 
 
-class StandardEntangledPair(MixedStateEntanglement):
+
+class StandardEntangledPair(BellDiagonalPair):
     '''
     Custom entanglement for distro app
     '''
-    def __init__(self, fidelity: float = 0.99, b: float | None = None, c: float | None = None, d: float | None = None, name: str | None = None):
-        super().__init__(fidelity, b, c, d, name)
-        self.src = None
-        self.dst = None
-        self.account: EprAccount = None
-
-
+    __slots__ = ()
@@ -1,48 +1,167 @@
 from qns.network import QuantumNetwork
 from qns.network.topology import Topology
-from qns.network.network import ClassicTopology
-import itertools
+from qns.entity.cchannel import ClassicChannel
 from qns.network.requests import Request
-from vlaware_qnode import VLAwareQNode
+from vlaware_qnode import VLAwareQNode, IdAllocator
 from vl_routing import VLEnabledRouteAlgorithm
 from metadata import SimData
-from vl_animation import EntanglementLogEntry
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import networkx as nx
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
-import queue
 import numpy as np
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from node2vec import Node2Vec
-from community import community_louvain
-from collections import defaultdict
+from collections import defaultdict, deque
+import dataclasses
+import hashlib
+import json
+import os
+
+@dataclass
+class VLinkPlan:
+    '''
+    Outcome of vlink selection, by node name so it can be stored and reused for the same topology
+    '''
+    partition: Dict[str, int]
+    centroids: List[str]
+    vlinks: List[Tuple[str, str]]
 
 class VLNetGraph():
     '''
     For routing and animation
+
+    Physical edges are int32 CSR arrays indexed by node position, shared between the lvl0 and lvl1 graph.
+    Virtual edges of the lvl1 graph are a small overlay on top of them, a networkx view is only built when .graph is accessed.
     '''
-    def __init__(self, nodes: List[VLAwareQNode], qchannels: List[VLAwareQNode], lvl: int = 0, vlinks: List[Request] = None):
+    def __init__(self, nodes: List[VLAwareQNode], qchannels: List[VLAwareQNode], lvl: int = 0, vlinks: List[Request] = None, physical: Optional['VLNetGraph'] = None):
         self.nodes = nodes
         self.qchannels = qchannels
         self.vlinks = vlinks
         self.lvl = lvl
-        self.graph = nx.Graph()
 
-        self.graph.add_nodes_from(self.nodes) # add nodes
-        for qchannel in self.qchannels: # add edges 
-            self.graph.add_edge(qchannel.node_list[0], qchannel.node_list[1], type='physical')
+        if physical is not None: # share physical adjacency
+            self.node_index: Dict[VLAwareQNode, int] = physical.node_index
+            self.indptr: np.ndarray = physical.indptr
+            self.indices: np.ndarray = physical.indices
+        else:
+            self.node_index: Dict[VLAwareQNode, int] = {node: idx for idx, node in enumerate(self.nodes)}
+            edges = np.array([(self.node_index[q.node_list[0]], self.node_index[q.node_list[1]]) for q in self.qchannels], dtype=np.int32).reshape(-1, 2)
+            edges = np.unique(np.concatenate([edges, edges[:, ::-1]]), axis=0) # both directions, sorted by row
+            self.indptr: np.ndarray = np.searchsorted(edges[:, 0], np.arange(len(self.nodes) + 1)).astype(np.int32)
+            self.indices: np.ndarray = edges[:, 1].copy()
+
+        self.overlay: Dict[Tuple[int, int], bool] = {} # virtual edge (a, b) with a < b -> physical edge underneath
+        self._csr = None # physical plus virtual edges as scipy matrix, rebuilt after overlay changes
+        self._graph: Optional[nx.Graph] = None # networkx view, built on request
         if self.lvl == 1:
             for vlink in self.vlinks: # additional virtual edges in lvl1 graph
-                self.graph.add_edge(vlink.src, vlink.dest, type='entanglement')
-
+                self.add_virtual_edge(vlink.src, vlink.dest)
+
+    def _key(self, src: VLAwareQNode, dest: VLAwareQNode) -> Tuple[int, int]:
+        a, b = self.node_index[src], self.node_index[dest]
+        return (a, b) if a < b else (b, a)
+
+    def _changed(self):
+        self._csr = None
+        self._graph = None
+
+    def add_virtual_edge(self, src: VLAwareQNode, dest: VLAwareQNode) -> bool:
+        '''
+        Overlay vlink on the lvl1 graph, returns whether connectivity changed (false if the nodes are already adjacent)
+        '''
+        if self.lvl != 1:
+            raise ValueError('Virtual edges only exist in lvl1 graph')
+        key = self._key(src, dest)
+        if key in self.overlay: # parallel vlink
+            return False
+        self.overlay[key] = self.is_physical_edge(src, dest)
+        self._changed()
+        return not self.overlay[key]
+
+    def remove_virtual_edge(self, src: VLAwareQNode, dest: VLAwareQNode) -> bool:
+        '''
+        Remove vlink overlay, returns whether connectivity changed (false if a physical edge remains)
+        '''
+        if self.lvl != 1:
+            raise ValueError('Virtual edges only exist in lvl1 graph')
+        key = self._key(src, dest)
+        if key not in self.overlay:
+            raise ValueError(f'No virtual edge between {src} and {dest}')
+        physical = self.overlay.pop(key)
+        self._changed()
+        return not physical
+
+    def neighbors(self, idx: int) -> np.ndarray:
+        '''
+        Physical neighbours of node position idx, sorted
+        '''
+        return self.indices[self.indptr[idx]:self.indptr[idx + 1]]
+
+    def is_physical_edge(self, src: VLAwareQNode, dest: VLAwareQNode) -> bool:
+        neighbors = self.neighbors(self.node_index[src])
+        b = self.node_index[dest]
+        pos = np.searchsorted(neighbors, b)
+        return bool(pos < len(neighbors) and neighbors[pos] == b)
+
+    def has_edge(self, src: VLAwareQNode, dest: VLAwareQNode) -> bool:
+        return self._key(src, dest) in self.overlay or self.is_physical_edge(src, dest)
+
+    def edge_type(self, src: VLAwareQNode, dest: VLAwareQNode) -> Optional[str]:
+        if self._key(src, dest) in self.overlay:
+            return 'entanglement'
+        return 'physical' if self.is_physical_edge(src, dest) else None
+
+    def edges(self) -> List[Tuple[int, int, str]]:
+        '''
+        All edges once as (a, b, type) with a < b
+        '''
+        rows = np.repeat(np.arange(len(self.nodes), dtype=np.int32), np.diff(self.indptr))
+        upper = rows < self.indices
+        edges = [(a, b, 'entanglement' if (a, b) in self.overlay else 'physical') for a, b in zip(rows[upper].tolist(), self.indices[upper].tolist())]
+        edges += [(a, b, 'entanglement') for (a, b), physical in self.overlay.items() if not physical]
+        return edges
+
+    def fingerprint(self) -> str:
+        '''
+        Hash over node names and typed edges, stable across runs and processes
+        '''
+        h = hashlib.sha1()
+        h.update(','.join(node.name for node in self.nodes).encode())
+        edges = sorted('-'.join(sorted([self.nodes[a].name, self.nodes[b].name])) + ':' + edge_type for a, b, edge_type in self.edges())
+        h.update(b'|' + ';'.join(edges).encode())
+        return h.hexdigest()
+
+    def to_csr(self):
+        '''
+        Unweighted adjacency as symmetric scipy CSR matrix indexed by node position
+        '''
+        if self._csr is None:
+            from scipy.sparse import csr_matrix
+            n = len(self.nodes)
+            virtual = [key for key, physical in self.overlay.items() if not physical]
+            if virtual:
+                a, b = np.array(virtual, dtype=np.int32).T
+                rows = np.concatenate([np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr)), a, b])
+                cols = np.concatenate([self.indices, b, a])
+                self._csr = csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+            else:
+                self._csr = csr_matrix((np.ones(len(self.indices), dtype=np.int8), self.indices, self.indptr), shape=(n, n))
+        return self._csr
+
+    @property
+    def graph(self) -> nx.Graph:
+        '''
+        networkx view with 'type' and 'physical' edge attributes, for louvain, plotting and analysis
+        '''
+        if self._graph is None:
+            self._graph = nx.Graph()
+            self._graph.add_nodes_from(self.nodes)
+            for a, b, edge_type in self.edges():
+                self._graph.add_edge(self.nodes[a], self.nodes[b], type=edge_type, physical=self.overlay.get((a, b), True))
+        return self._graph
 
     def shortest_path(self, source, target) -> List[Tuple[Tuple[VLAwareQNode, VLAwareQNode], str]]:
         shortest_path = nx.shortest_path(self.graph, source=source, target=target)
         path_edges = [(shortest_path[i], shortest_path[i+1]) for i in range(len(shortest_path)-1)] # get additional information over edge type
-        edge_types = [self.graph.get_edge_data(u, v)['type'] for u, v in path_edges]
+        edge_types = [self.edge_type(u, v) for u, v in path_edges]
         shortest_path = list(zip(path_edges, edge_types))
         return shortest_path
 
@@ -50,29 +169,36 @@ class VLNetGraph():
     def shortest_path_length(self, source, target) -> int:
         shortest_path_length = nx.shortest_path_length(self.graph, source=source, target=target)
         return shortest_path_length
+
+    def shortest_path_tree(self, source) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Single BFS from source in scipy, returns predecessor and distance arrays by node position, -1 if unreachable (or no predecessor)
+        '''
+        from scipy.sparse.csgraph import shortest_path
+        dist, pred = shortest_path(self.to_csr(), directed=False, unweighted=True, return_predecessors=True, indices=self.node_index[source])
+        dist = np.where(np.isinf(dist), -1, dist).astype(np.int32)
+        pred = np.where(pred < 0, -1, pred).astype(np.int32) # scipy marks missing predecessors with -9999
+        return pred, dist
     
 class VLNetwork(QuantumNetwork):
     '''
     Quantum network containing special request types called superlinks, that are considered for routing as entanglement links
     '''
-    def __init__(self, topo: Topology, metadata: SimData, continuous_distro: bool, schedule_n_vlinks: Optional[int], custom_vlinks: List[Tuple[str]], vlink_send_rate: float, vls: bool = True, session_count: int = 0):
-        # init metadata
-        self.metadata: SimData = metadata
-        self.metadata.distribution_requests = set()
-        self.metadata.vlink_requests = set()
-        self.metadata.distro_results = {}
-        self.metadata.entanglement_log = [] # for plotting
-        self.metadata.entanglement_log_timestamps = {} # for plotting
-
+    def __init__(self, topo: Topology, metadata: SimData, continuous_distro: bool, schedule_n_vlinks: Optional[int], custom_vlinks: List[Tuple[str]], vlink_send_rate: float, vls: bool = True, session_count: int = 0, lazy_routing: bool = False, route_cache_size: int = 256, route_build_mode: str = 'bfs', route_cache_dir: Optional[str] = None, vlink_seed: Optional[int] = None, vlink_plan_cache_dir: Optional[str] = None, fast_forward: bool = False, park_sessions: bool = True):
+        self.set_metadata(metadata)
 
         # members
         self.name = 'vl network'
+        self.vlink_graph: Optional[VLNetGraph] = None # vlinks added before this exists are picked up on construction
         self.vlink_send_rate = vlink_send_rate
         self.continuous_distro: bool = continuous_distro
+        self.fast_forward: bool = fast_forward
+        self.park_sessions: bool = park_sessions # sessions that cannot send wait for a wakeup instead of polling
         self.schedule_n_vlinks: Optional[int] = schedule_n_vlinks
         self.requests: List[Request] = []
         self.nodes, self.qchannels = topo.build()
-        self.cchannels = topo.add_cchannels(classic_topo=ClassicTopology.All, nl=self.nodes, ll=self.qchannels)
+        self.cchannel_args: Dict = topo.cchannel_args
+        self.cchannels: List[ClassicChannel] = [] # created on first use instead of a full mesh, see connect_cchannel
         for n in self.nodes:
             n.add_network(self)
 
@@ -94,48 +220,15 @@ class VLNetwork(QuantumNetwork):
             '''
 
 
-            # louvain algorithm
-            partition = community_louvain.best_partition(self.physical_graph.graph, randomize=True)
-            communities = defaultdict(list)
-            for node, community in partition.items():
-                communities[community].append(node)
-            sorted_communities = dict(sorted(communities.items(), key=lambda x: len(x[1]), reverse=True))
-
-            # centroids
-            centroid_nodes = [self.find_centroid(self.physical_graph.graph, nodes) for nodes in sorted_communities.values()]
-
-            # compute shortes path lengths between all pairs of centroids
-            distances = dict(nx.all_pairs_shortest_path_length(self.physical_graph.graph))
-            pairs_with_distances = []
-
-
-            for i, src_node in enumerate(centroid_nodes):
-                for j, tgt_node in enumerate(centroid_nodes):
-                    if i is not j:
-                        path_length = distances[src_node][tgt_node]
-                        pairs_with_distances.append((src_node, tgt_node, path_length))
-
-
-            # sort pairs by path length in descending order
-            pairs_with_distances.sort(key=lambda x: x[2], reverse=True)
-
-            # select to maximize path length
-            selected_vlinks = []
-            used_nodes = set()
-            for pair in pairs_with_distances:
-                src_node, tgt_node, path_length = pair
-                if path_length >= 3:
-                    if src_node not in used_nodes and tgt_node not in used_nodes:
-                        selected_vlinks.append((src_node, tgt_node))
-                        used_nodes.add(src_node)
-                        used_nodes.add(tgt_node)
-
+            # louvain communities, centroids and selected pairs, possibly from an earlier run
+            plan = self.load_vlink_plan(vlink_seed, vlink_plan_cache_dir)
+            selected_vlinks = plan.vlinks
 
             self.vlink_send_rate = 10 * (session_count / len(selected_vlinks) * 1.2)
             if selected_vlinks:
                 for vlink_pair in selected_vlinks:
-                    src_node = self.get_node(vlink_pair[0].name)
-                    tgt_node = self.get_node(vlink_pair[1].name)
+                    src_node = self.get_node(vlink_pair[0])
+                    tgt_node = self.get_node(vlink_pair[1])
                     self.add_vlink(src=src_node, dest=tgt_node, attr={'send_rate': self.vlink_send_rate})
 
 
@@ -158,19 +251,235 @@ class VLNetwork(QuantumNetwork):
             '''
 
         # set routing algorithm
-        self.vlink_graph = VLNetGraph(self.nodes, self.qchannels, vlinks=self.vlinks, lvl=1)
-        self.route = VLEnabledRouteAlgorithm(self.physical_graph, self.vlink_graph)
+        self.vlink_graph = VLNetGraph(self.nodes, self.qchannels, vlinks=self.vlinks, lvl=1, physical=self.physical_graph)
+        self.route = VLEnabledRouteAlgorithm(self.physical_graph, self.vlink_graph, build_mode=route_build_mode, lazy=lazy_routing, cache_size=route_cache_size, cache_dir=route_cache_dir)
+
+    def set_metadata(self, metadata: SimData):
+        self.ids = IdAllocator() # fresh ids for every run on this network
+        self.vlink_supply: Dict[frozenset, Any] = {} # fast forward only, endpoints -> VLinkSupply
+
+        # init metadata
+        self.metadata: SimData = metadata
+        self.metadata.distribution_requests = set()
+        self.metadata.vlink_requests = set()
+        self.metadata.distro_results = {}
+        self.metadata.entanglement_log = [] # for plotting
+        self.metadata.entanglement_log_timestamps = {} # for plotting
+
+    def reset(self, metadata: SimData):
+        '''
+        Reuse the built network for another run: clears all run state and requests, keeps nodes, channels, vlinks and routes.
+        Add new requests and install a new simulator afterwards.
+        '''
+        self.set_metadata(metadata)
+        self.requests.clear()
+        for node in self.nodes:
+            node.reset()
+
+    def connect_cchannel(self, src: VLAwareQNode, dest: VLAwareQNode) -> ClassicChannel:
+        '''
+        Direct classic channel between two nodes, same arguments and delay model as the full mesh of ClassicTopology.All
+        '''
+        cchannel = ClassicChannel(name=f'c-{src.name}-{dest.name}', **self.cchannel_args)
+        if src is dest: # loopback for messages to the own node, the mesh used to pick any channel of the node
+            cchannel.node_list = [src, src]
+            src.cchannels.append(cchannel)
+            src.cchannel_map[src] = cchannel
+        else:
+            src.add_cchannel(cchannel)
+            dest.add_cchannel(cchannel)
+        if src._simulator is not None: # network is already installed
+            cchannel.install(src._simulator)
+        self.cchannels.append(cchannel)
+        return cchannel
+
+    def query_next_hop(self, src: VLAwareQNode, dest: VLAwareQNode) -> Optional[Tuple[VLAwareQNode, VLAwareQNode, bool]]:
+        '''
+        Physical next hop, virtual next hop and vlink flag without building full paths
+        '''
+        return self.route.query_next_hop(src, dest)
+
+    def add_vlink(self, src: VLAwareQNode, dest: VLAwareQNode, attr: Optional[Dict] = None) -> Request:
+        attr = {'send_rate': self.vlink_send_rate} if attr is None else attr
+        if 'send_rate' not in attr:
+            raise ValueError('vlink requires a send_rate')
+        if src == dest:
+            raise ValueError('vlink requires two distinct nodes')
 
-    def add_vlink(self, src: VLAwareQNode, dest: VLAwareQNode, attr: Dict = {}):
         vlink = Request(src=src, dest=dest, attr=attr)
+        parallel = self.vlink_graph is not None and any({v.src, v.dest} == {src, dest} for v in self.vlinks)
         self.vlinks.append(vlink)
         src.add_vlink(vlink)
         dest.add_vlink(vlink)
 
+        if self.vlink_graph is not None: # runtime change, update routing incrementally
+            if not parallel:
+                self.route.add_vlink(src, dest)
+            if src.maint_app is not None and src.maint_app._simulator is not None: # start maintenance if network is already running
+                src.maint_app.start_session(vlink)
+        return vlink
+
+    def remove_vlink(self, vlink: Request):
+        '''
+        Remove vlink at runtime: stops its maintenance session, frees its buffered vlinks,
+        updates routing incrementally and re-routes transmits that were waiting for it
+        '''
+        if vlink not in self.vlinks:
+            raise ValueError(f'Unknown vlink {vlink}')
+
+        self.vlinks.remove(vlink)
+        vlink.src.vlinks.remove(vlink)
+        vlink.dest.vlinks.remove(vlink)
+
+        # stop maintenance, only sessions started for this vlink
+        session_ids = set()
+        for node in [vlink.src, vlink.dest]:
+            for session_id, session in list(node.session_registry.items()):
+                if session.get('request') is vlink:
+                    session_ids.add(session_id)
+                    del node.session_registry[session_id]
+
+        # free established vlinks of this session on both ends
+        for node in [vlink.src, vlink.dest]:
+            for transmit in [t for t in node.vlink_buf if t.session in session_ids]:
+                node.vlink_buf.remove(transmit)
+                node.memories[0].read(transmit.charlie.name)
+                node.trans_registry.evict(transmit.id)
+            if node.maint_app is not None and node.maint_app.parked_sessions:
+                node.maint_app.wake_parked()
+
+        if self.vlink_graph is None:
+            return
+        parallel_vlinks = [v for v in self.vlinks if {v.src, v.dest} == {vlink.src, vlink.dest}]
+        if not parallel_vlinks:
+            self.route.remove_vlink(vlink.src, vlink.dest)
+
+        # transmits parked for a vlink that is no longer on their route continue physically
+        for node in [vlink.src, vlink.dest]:
+            if node.distro_app is not None and node.distro_app._simulator is not None:
+                node.distro_app.release_waiting()
+
+    def plan_vlinks(self, seed: Optional[int] = None) -> VLinkPlan:
+        '''
+        Louvain communities, their centroids and the selected centroid pairs
+        '''
+        # louvain algorithm
+        from community import community_louvain # only needed when vlinks are planned, not loaded
+        if seed is None:
+            partition = community_louvain.best_partition(self.physical_graph.graph, randomize=True)
+        else: # still randomized, but reproducible
+            partition = community_louvain.best_partition(self.physical_graph.graph, random_state=seed)
+        communities = defaultdict(list)
+        for node, community in partition.items():
+            communities[community].append(node)
+        sorted_communities = dict(sorted(communities.items(), key=lambda x: len(x[1]), reverse=True))
+
+        # centroids
+        centroid_nodes = [self.find_centroid(self.physical_graph.graph, nodes) for nodes in sorted_communities.values()]
+
+        selected_vlinks = self.select_vlinks(centroid_nodes)
+        return VLinkPlan(
+            partition={node.name: community for node, community in partition.items()},
+            centroids=[node.name for node in centroid_nodes],
+            vlinks=[(src.name, dst.name) for src, dst in selected_vlinks]
+        )
+
+    def load_vlink_plan(self, seed: Optional[int] = None, cache_dir: Optional[str] = None) -> VLinkPlan:
+        '''
+        Reuse the plan of an earlier run with the same topology and seed, unseeded plans are random and never cached
+        '''
+        if seed is None or cache_dir is None:
+            return self.plan_vlinks(seed)
+
+        cache_file = os.path.join(cache_dir, f'{self.physical_graph.fingerprint()}_{seed}.json')
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                data = json.load(f)
+            return VLinkPlan(partition=data['partition'], centroids=data['centroids'], vlinks=[tuple(pair) for pair in data['vlinks']])
+
+        plan = self.plan_vlinks(seed)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(dataclasses.asdict(plan), f)
+        os.replace(tmp_file, cache_file) # atomic for parallel workers
+        return plan
+
+    def select_vlinks(self, centroid_nodes: List[VLAwareQNode]) -> List[Tuple[VLAwareQNode, VLAwareQNode]]:
+        '''
+        Greedily pair centroids with the longest physical distance (at least 3 hops), each centroid is used once
+        '''
+        # shortest path lengths from the centroids only, one BFS per centroid instead of all pairs
+        distances = {src_node: self.physical_graph.shortest_path_tree(src_node)[1] for src_node in centroid_nodes}
+        pairs_with_distances = []
+
+        for i, src_node in enumerate(centroid_nodes):
+            for j, tgt_node in enumerate(centroid_nodes):
+                if i is not j:
+                    path_length = int(distances[src_node][self.physical_graph.node_index[tgt_node]])
+                    if path_length == -1:
+                        raise KeyError(f'No path between {src_node} and {tgt_node}') # as the former distance dict lookup
+                    pairs_with_distances.append((src_node, tgt_node, path_length))
+
+        # sort pairs by path length in descending order
+        pairs_with_distances.sort(key=lambda x: x[2], reverse=True)
+
+        # select to maximize path length
+        selected_vlinks = []
+        used_nodes = set()
+        for pair in pairs_with_distances:
+            src_node, tgt_node, path_length = pair
+            if path_length >= 3:
+                if src_node not in used_nodes and tgt_node not in used_nodes:
+                    selected_vlinks.append((src_node, tgt_node))
+                    used_nodes.add(src_node)
+                    used_nodes.add(tgt_node)
+        return selected_vlinks
+
     def find_centroid(self, G, nodes):
+        '''
+        Exact graph center of the community, one of nx.center(subgraph).
+        Eccentricity bounds from a few BFS sweeps (Takes & Kosters) resolve or discard most nodes, instead of one BFS per node.
+        '''
         subgraph = G.subgraph(nodes)
-        centroid = nx.center(subgraph)[0]
-        return centroid
+        order = list(dict.fromkeys(nodes)) # ties go to the first node of the community, subgraph order depends on object hashes
+        adj = {v: list(subgraph.adj[v]) for v in order}
+        lower = dict.fromkeys(order, 0)
+        upper = dict.fromkeys(order, len(order))
+        candidates = set(order)
+        ecc = {}
+
+        lowest = True
+        while candidates:
+            # alternate between most central and most peripheral candidate
+            v = min(candidates, key=lower.get) if lowest else max(candidates, key=upper.get)
+            lowest = not lowest
+
+            dist = {v: 0}
+            frontier = deque([v])
+            while frontier:
+                u = frontier.popleft()
+                for w in adj[u]:
+                    if w not in dist:
+                        dist[w] = dist[u] + 1
+                        frontier.append(w)
+            if len(dist) < len(order):
+                raise nx.NetworkXError('Found infinite path length because the graph is not connected')
+
+            e = max(dist.values())
+            for w in candidates:
+                lower[w] = max(lower[w], dist[w], e - dist[w])
+                upper[w] = min(upper[w], e + dist[w])
+            radius_upper = min(upper.values())
+            for w in list(candidates):
+                if lower[w] == upper[w]: # exact eccentricity
+                    ecc[w] = lower[w]
+                    candidates.discard(w)
+                elif lower[w] > radius_upper: # can not be a center node
+                    candidates.discard(w)
+
+        radius = min(ecc.values())
+        return next(v for v in order if ecc.get(v) == radius)
 
     
 
@@ -4,19 +4,42 @@ from qns.entity.qchannel import QuantumChannel
 
 from vlaware_qnode import VLAwareQNode
 
-from typing import Callable, Union, List, Tuple, Dict
+from typing import Callable, Optional, Union, List, Tuple, Dict
 from dataclasses import dataclass
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import os
 
-@dataclass
+# row layout of the route table
+NEXT_HOP_PHYSICAL = 0
+DIST_PHYSICAL = 1
+NEXT_HOP_VIRTUAL = 2
+DIST_VIRTUAL = 3
+PRED_PHYSICAL = 4 # predecessor rows, lazy mode only
+PRED_VIRTUAL = 5
+
+@dataclass(frozen=True)
 class RoutingResult:
     metric_physical: int
     metric_virtual: int
-    path_physical: List[VLAwareQNode]
-    path_virtual: List[VLAwareQNode]
+    path_physical: Tuple[VLAwareQNode, ...]
+    path_virtual: Tuple[VLAwareQNode, ...]
     next_hop_physical: VLAwareQNode
     next_hop_virtual: VLAwareQNode
     vlink: bool
 
+@dataclass(frozen=True)
+class BatchRoutingResult:
+    '''
+    Arrays aligned with the queried pairs, -1 marks unreachable or src == dest (no next hop)
+    '''
+    metric_physical: np.ndarray
+    metric_virtual: np.ndarray
+    next_hop_physical: np.ndarray # node indices into VLEnabledRouteAlgorithm.nodes
+    next_hop_virtual: np.ndarray
+    vlink: np.ndarray
+
 @dataclass
 class RoutingTableEntry:
     metric_virtual: int
@@ -27,65 +50,359 @@ class RoutingTableEntry:
 class VLEnabledRouteAlgorithm(RouteImpl):
     '''
     Dijkstra over virtual links
+
+    Route table is stored as int32 next hop and distance matrices indexed by node position, one pair per graph level.
+    Paths are only reconstructed from the next hop matrices when asked for.
+    Build mode 'csgraph' fills both levels with scipy's all pairs shortest path on CSR adjacencies instead of one python BFS per source.
+    With a cache_dir the eager table is stored as <fingerprint>.npy and memory mapped (copy on write) by later builds of the same graphs.
+    In lazy mode nothing is built up front, the shortest path trees of a source are computed on first query and kept in an LRU cache.
+    A cached tree also holds the predecessor rows, so paths of that source are rebuilt without touching other sources.
+    Query results are immutable and memoized per (src, dst) in an LRU of cache_size pairs until the next build or invalidate.
+    This only serves query_route callers, forwarding uses query_next_hop which never builds a result.
     '''
-    def __init__(self, physical_graph, vlink_graph, metric_func: Callable[[Union[QuantumChannel, ClassicChannel]], float] = None) -> None:
+    def __init__(self, physical_graph, vlink_graph, metric_func: Callable[[Union[QuantumChannel, ClassicChannel]], float] = None, build_mode: str = 'bfs', lazy: bool = False, cache_size: int = 256, cache_dir: Optional[str] = None) -> None:
         super().__init__('vl_dijkstra')
+        if build_mode not in ['bfs', 'pairwise', 'csgraph']:
+            raise ValueError(f'Invalid build mode \'{build_mode}\'')
+        if lazy and build_mode != 'bfs':
+            raise ValueError('Lazy routing only supports build mode \'bfs\'')
+        if cache_size < 1:
+            raise ValueError('Route cache size must be at least 1')
 
         # members
         self.physical_graph = physical_graph
         self.vlink_graph = vlink_graph
-        self.route_table = {}
+        self.build_mode: str = build_mode
+        self.lazy: bool = lazy
+        self.cache_size: int = cache_size
+        self.cache_dir: Optional[str] = cache_dir
         self.metric_func = lambda _: 1 if metric_func is None else self.metric_func
 
+        # route table, -1 marks unreachable
+        self.nodes: List[VLAwareQNode] = []
+        self.node_index: Dict[VLAwareQNode, int] = {}
+        self.table: Optional[np.ndarray] = None # shape (4, n, n), eager mode only
+        self.next_hop_physical: Optional[np.ndarray] = None
+        self.dist_physical: Optional[np.ndarray] = None
+        self.next_hop_virtual: Optional[np.ndarray] = None
+        self.dist_virtual: Optional[np.ndarray] = None
+        self.row_cache: OrderedDict[int, np.ndarray] = OrderedDict() # lazy mode only, source index -> (6, n) rows
+        self.result_cache: OrderedDict[Tuple[int, int], RoutingResult] = OrderedDict() # (source index, destination index) -> result
+
     def build(self, nodes: List[VLAwareQNode], channels: List[Union[QuantumChannel, ClassicChannel]]):
-        for source in nodes:
-            self.route_table[source] = {}
-            for target in nodes:
+        self.nodes = list(nodes)
+        if self.nodes != self.physical_graph.nodes:
+            raise ValueError('Route nodes must be in the order of the graph nodes') # tables share the graph node positions
+        self.node_index = self.physical_graph.node_index
+        self.invalidate()
+        if self.lazy:
+            return
+
+        cache_file = None
+        if self.cache_dir is not None:
+            cache_file = os.path.join(self.cache_dir, f'{self.fingerprint()}.npy')
+            if os.path.exists(cache_file):
+                self.table = np.load(cache_file, mmap_mode='c') # incremental vlink updates stay in memory
+                self.next_hop_physical, self.dist_physical, self.next_hop_virtual, self.dist_virtual = self.table
+                return
+
+        n = len(self.nodes)
+        self.table = np.full((4, n, n), -1, dtype=np.int32)
+        self.next_hop_physical, self.dist_physical, self.next_hop_virtual, self.dist_virtual = self.table
+
+        if self.build_mode == 'bfs':
+            self._build_bfs()
+        elif self.build_mode == 'csgraph':
+            self._build_csgraph()
+        else:
+            self._build_pairwise()
+
+        if cache_file is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'wb') as f:
+                np.save(f, self.table)
+            os.replace(tmp_file, cache_file) # atomic, other workers never see partial tables
+
+    def fingerprint(self) -> str:
+        '''
+        Hash over node order, physical graph and lvl1 graph, i.e. the topology plus the vlink set
+        '''
+        h = hashlib.sha1()
+        h.update(','.join(node.name for node in self.nodes).encode())
+        h.update(f'|{self.physical_graph.fingerprint()}|{self.vlink_graph.fingerprint()}'.encode())
+        return h.hexdigest()
+
+    def invalidate(self):
+        '''
+        Drop memoized results and lazily computed rows, needed whenever graphs change
+        '''
+        self.row_cache.clear()
+        self.result_cache.clear()
+
+    def add_vlink(self, src: VLAwareQNode, dest: VLAwareQNode):
+        '''
+        Add virtual edge and update only the pairs whose virtual shortest path gets shorter through it
+        '''
+        if not self.vlink_graph.add_virtual_edge(src, dest): # overlay on physical edge, only edge type changed
+            self.result_cache.clear()
+            return
+        if self.lazy or self.table is None:
+            self.invalidate()
+            return
+
+        a, b = self.node_index[src], self.node_index[dest]
+        dist = self.dist_virtual.astype(np.int64)
+        dist[dist == -1] = len(self.nodes) + 1 # unreachable
+        via_ab = dist[:, a, None] + 1 + dist[None, b, :] # s -> a - b -> t
+        via_ba = dist[:, b, None] + 1 + dist[None, a, :] # s -> b - a -> t
+        use_ab = (via_ab < dist) & (via_ab <= via_ba)
+        use_ba = (via_ba < dist) & ~use_ab
+
+        # next hop towards the vlink entry, or the vlink itself when standing on it
+        towards_a = self.next_hop_virtual[:, a].copy()
+        towards_a[a] = b
+        towards_b = self.next_hop_virtual[:, b].copy()
+        towards_b[b] = a
+
+        self.next_hop_virtual[use_ab] = np.broadcast_to(towards_a[:, None], dist.shape)[use_ab]
+        self.dist_virtual[use_ab] = via_ab[use_ab]
+        self.next_hop_virtual[use_ba] = np.broadcast_to(towards_b[:, None], dist.shape)[use_ba]
+        self.dist_virtual[use_ba] = via_ba[use_ba]
+
+        self._drop_results(np.flatnonzero((use_ab | use_ba).any(axis=1)))
+
+    def remove_vlink(self, src: VLAwareQNode, dest: VLAwareQNode):
+        '''
+        Remove virtual edge and recompute only the sources that have it on one of their shortest paths
+        '''
+        if self.vlink_graph.is_physical_edge(src, dest): # physical edge stays, only edge type changes
+            self.vlink_graph.remove_virtual_edge(src, dest)
+            self.result_cache.clear()
+            return
+        if self.lazy or self.table is None:
+            self.vlink_graph.remove_virtual_edge(src, dest)
+            self.invalidate()
+            return
+
+        a, b = self.node_index[src], self.node_index[dest]
+        dist = self.dist_virtual
+        on_path_ab = dist[:, a, None] + 1 + dist[None, b, :] == dist # s -> a - b -> t
+        on_path_ba = dist[:, b, None] + 1 + dist[None, a, :] == dist # s -> b - a -> t
+        affected = np.flatnonzero((on_path_ab | on_path_ba).any(axis=1))
+
+        self.vlink_graph.remove_virtual_edge(src, dest)
+        for s in affected:
+            s = int(s)
+            self.next_hop_virtual[s] = -1
+            self.dist_virtual[s] = -1
+            self._fill_row(self.vlink_graph, self.nodes[s], self.next_hop_virtual[s], self.dist_virtual[s])
+        self._drop_results(affected)
+
+    def _drop_results(self, sources: np.ndarray):
+        sources = set(int(s) for s in sources)
+        for key in [key for key in self.result_cache if key[0] in sources]:
+            del self.result_cache[key]
+
+    def _build_bfs(self):
+        '''
+        One BFS per source and graph level, next hops are read from the predecessor tables
+        '''
+        for source in self.nodes:
+            self._fill_rows(source, self.table[:, self.node_index[source]])
+
+    def _build_csgraph(self):
+        '''
+        All pairs shortest paths in scipy, graphs are undirected so the next hop s -> t is the predecessor of s in the tree of t
+        '''
+        from scipy.sparse.csgraph import shortest_path
+        for graph, next_hop, dist in [(self.physical_graph, self.next_hop_physical, self.dist_physical), (self.vlink_graph, self.next_hop_virtual, self.dist_virtual)]:
+            d, pred = shortest_path(graph.to_csr(), directed=False, unweighted=True, return_predecessors=True)
+            reachable = np.isfinite(d)
+            dist[reachable] = d[reachable]
+            next_hop[:] = np.where(pred.T < 0, -1, pred.T) # scipy marks missing predecessors with -9999
+
+    def _fill_rows(self, source: VLAwareQNode, rows: np.ndarray):
+        with_pred = len(rows) > PRED_PHYSICAL
+        self._fill_row(self.physical_graph, source, rows[NEXT_HOP_PHYSICAL], rows[DIST_PHYSICAL], rows[PRED_PHYSICAL] if with_pred else None)
+        self._fill_row(self.vlink_graph, source, rows[NEXT_HOP_VIRTUAL], rows[DIST_VIRTUAL], rows[PRED_VIRTUAL] if with_pred else None)
+
+    def _fill_row(self, graph, source: VLAwareQNode, next_hop_row: np.ndarray, dist_row: np.ndarray, pred_row: Optional[np.ndarray] = None):
+        pred, dist = graph.shortest_path_tree(source)
+        dist_row[:] = dist
+        if pred_row is not None:
+            pred_row[:] = pred
+
+        # first hop is the ancestor at distance 1, found by pointer jumping up the tree
+        first_hop = np.where(dist > 1, pred, np.arange(len(dist), dtype=np.int32))
+        while True:
+            jumped = first_hop[first_hop]
+            if np.array_equal(jumped, first_hop):
+                break
+            first_hop = jumped
+        next_hop_row[:] = np.where(dist > 0, first_hop, -1)
+
+    def _rows(self, s: int) -> np.ndarray:
+        '''
+        Table rows of source s, computed and cached on first use in lazy mode
+        '''
+        if not self.lazy:
+            return self.table[:, s]
+
+        rows = self.row_cache.get(s)
+        if rows is not None:
+            self.row_cache.move_to_end(s)
+            return rows
+
+        rows = np.full((6, len(self.nodes)), -1, dtype=np.int32)
+        self._fill_rows(self.nodes[s], rows)
+        self.row_cache[s] = rows
+        if len(self.row_cache) > self.cache_size:
+            self.row_cache.popitem(last=False) # evict least recently used source
+        return rows
+
+    def _build_pairwise(self):
+        for source in self.nodes:
+            s = self.node_index[source]
+            for target in self.nodes:
+                t = self.node_index[target]
 
                 # build lvl0 path - physical
                 shortest_path_physical = self.physical_graph.shortest_path(source, target)
-                shortest_path_physical_length = self.physical_graph.shortest_path_length(source, target)
+                self.dist_physical[s, t] = self.physical_graph.shortest_path_length(source, target)
 
                 # build lvl1 path - entanglement enabled
                 shortest_path_vlink = self.vlink_graph.shortest_path(source, target)
-                shortest_path_vlink_length = self.vlink_graph.shortest_path_length(source, target)
-
-                entry = RoutingTableEntry(
-                    metric_virtual=shortest_path_vlink_length,
-                    path_virtual=shortest_path_vlink,
-                    metric_physical=shortest_path_physical_length,
-                    path_physical=shortest_path_physical
-                )
-                self.route_table[source][target] = entry
-
-    def query(self, src: VLAwareQNode, dest: VLAwareQNode) -> RoutingTableEntry:
-        src_route_table = self.route_table.get(src, None)
-        if src_route_table is None: 
-            return []
-        entry: RoutingTableEntry = src_route_table.get(dest, None)
-        if entry is None:
-            return []
-
-        try:
-            metric_physical: int = entry.metric_physical
-            metric_virtual: int = entry.metric_virtual
-            path_physical: List[VLAwareQNode] = [hop[0][1] for hop in entry.path_physical]
-            path_virtual: List[VLAwareQNode] = [hop[0][1] for hop in entry.path_virtual]
-            next_hop_physical: VLAwareQNode = path_physical[0]
-            next_hop_virtual: VLAwareQNode = path_virtual[0]
-            vlink = next_hop_virtual != next_hop_physical
-
-            result = RoutingResult(
-                metric_physical=metric_physical,
-                metric_virtual=metric_virtual,
-                path_physical=path_physical,
-                path_virtual=path_virtual,
-                next_hop_physical=next_hop_physical,
-                next_hop_virtual=next_hop_virtual,
-                vlink=vlink
-            )
+                self.dist_virtual[s, t] = self.vlink_graph.shortest_path_length(source, target)
+
+                if source != target:
+                    self.next_hop_physical[s, t] = self.node_index[shortest_path_physical[0][0][1]]
+                    self.next_hop_virtual[s, t] = self.node_index[shortest_path_vlink[0][0][1]]
+
+    def _path(self, level: int, s: int, t: int) -> List[int]:
+        if self.lazy: # walk back through the tree of s only
+            pred_row = self._rows(s)[PRED_PHYSICAL if level == NEXT_HOP_PHYSICAL else PRED_VIRTUAL]
+            if s != t and pred_row[t] == -1:
+                return []
+            path = []
+            while t != s:
+                path.append(t)
+                t = int(pred_row[t])
+            path.reverse()
+            return path
+
+        path = []
+        while s != t:
+            s = int(self._rows(s)[level, t])
+            if s == -1:
+                return []
+            path.append(s)
+        return path
 
+    def entry(self, src: VLAwareQNode, dest: VLAwareQNode) -> Optional[RoutingTableEntry]:
+        '''
+        Rebuild full routing table entry with ((u, v), type) paths
+        '''
+        s = self.node_index.get(src)
+        t = self.node_index.get(dest)
+        if s is None or t is None:
+            return None
+        rows = self._rows(s)
+        if rows[DIST_VIRTUAL, t] == -1:
+            return None
+
+        paths = []
+        for graph, level in [(self.physical_graph, NEXT_HOP_PHYSICAL), (self.vlink_graph, NEXT_HOP_VIRTUAL)]:
+            hops = [src] + [self.nodes[i] for i in self._path(level, s, t)]
+            paths.append([((u, v), graph.edge_type(u, v)) for u, v in zip(hops, hops[1:])])
+
+        return RoutingTableEntry(
+            metric_virtual=int(rows[DIST_VIRTUAL, t]),
+            path_virtual=paths[1],
+            metric_physical=int(rows[DIST_PHYSICAL, t]),
+            path_physical=paths[0]
+        )
+
+    def query_next_hop(self, src: VLAwareQNode, dest: VLAwareQNode) -> Optional[Tuple[VLAwareQNode, VLAwareQNode, bool]]:
+        '''
+        Only next hops and vlink flag, O(1) lookup without path reconstruction
+        '''
+        s = self.node_index.get(src)
+        t = self.node_index.get(dest)
+        if s is None or t is None:
+            return None
+        if self.lazy:
+            rows = self._rows(s)
+            next_hop_physical = rows[NEXT_HOP_PHYSICAL, t]
+            next_hop_virtual = rows[NEXT_HOP_VIRTUAL, t]
+        else:
+            next_hop_physical = self.next_hop_physical[s, t]
+            next_hop_virtual = self.next_hop_virtual[s, t]
+        if next_hop_physical == -1 or next_hop_virtual == -1:
+            return None
+        return self.nodes[next_hop_physical], self.nodes[next_hop_virtual], bool(next_hop_virtual != next_hop_physical)
+
+    def query_many(self, src_indices, dst_indices) -> BatchRoutingResult:
+        '''
+        Metrics, next hops and vlink flags of many (src, dst) index pairs at once, read directly from the route table
+        '''
+        src_indices = np.asarray(src_indices, dtype=np.intp)
+        dst_indices = np.asarray(dst_indices, dtype=np.intp)
+        if src_indices.shape != dst_indices.shape:
+            raise ValueError('Source and destination indices must have the same shape')
+
+        if self.lazy: # gather rows per distinct source
+            values = np.empty((4,) + src_indices.shape, dtype=np.int32)
+            for s in np.unique(src_indices):
+                mask = src_indices == s
+                values[:, mask] = self._rows(int(s))[:4, dst_indices[mask]]
+        else:
+            values = self.table[:, src_indices, dst_indices]
+
+        next_hop_physical, metric_physical, next_hop_virtual, metric_virtual = values
+        return BatchRoutingResult(
+            metric_physical=metric_physical,
+            metric_virtual=metric_virtual,
+            next_hop_physical=next_hop_physical,
+            next_hop_virtual=next_hop_virtual,
+            vlink=(next_hop_virtual != next_hop_physical) & (next_hop_physical != -1) & (next_hop_virtual != -1)
+        )
+
+    def query(self, src: VLAwareQNode, dest: VLAwareQNode) -> Optional[RoutingResult]:
+        '''
+        Memoized route, None if there is no route or src is dest
+        '''
+        s = self.node_index.get(src)
+        t = self.node_index.get(dest)
+        if s is None or t is None or s == t:
+            return None
+
+        result = self.result_cache.get((s, t))
+        if result is not None:
+            self.result_cache.move_to_end((s, t))
             return result
 
-        except Exception:
-            return []
+        rows = self._rows(s)
+        if rows[NEXT_HOP_PHYSICAL, t] == -1 or rows[NEXT_HOP_VIRTUAL, t] == -1:
+            return None
+
+        path_physical: Tuple[VLAwareQNode, ...] = tuple(self.nodes[i] for i in self._path(NEXT_HOP_PHYSICAL, s, t))
+        path_virtual: Tuple[VLAwareQNode, ...] = tuple(self.nodes[i] for i in self._path(NEXT_HOP_VIRTUAL, s, t))
+        next_hop_physical: VLAwareQNode = path_physical[0]
+        next_hop_virtual: VLAwareQNode = path_virtual[0]
+        vlink = next_hop_virtual != next_hop_physical
+
+        result = RoutingResult(
+            metric_physical=int(rows[DIST_PHYSICAL, t]),
+            metric_virtual=int(rows[DIST_VIRTUAL, t]),
+            path_physical=path_physical,
+            path_virtual=path_virtual,
+            next_hop_physical=next_hop_physical,
+            next_hop_virtual=next_hop_virtual,
+            vlink=vlink
+        )
+        self.result_cache[(s, t)] = result
+        if len(self.result_cache) > self.cache_size:
+            self.result_cache.popitem(last=False)
+
+        return result
@@ -1,24 +1,36 @@
 from qns.entity.node.app import Application
 from qns.entity.node import QNode
 from qns.network.requests import Request
+from qns.entity.cchannel import ClassicChannel
 
 from typing import List, Dict, Optional, Tuple
 
 from typing import Optional
 from dataclasses import dataclass
 from collections import deque
+import itertools
 import re
 #import queue
 
 
+class Registry(dict):
+    '''
+    Dict for per transmit bookkeeping: missing keys read as None, evict() deletes finished entries
+    '''
+    def __missing__(self, key):
+        return None
+
+    def evict(self, key):
+        self.pop(key, None)
+
 '''
 QNode with knowledge over vlink requests
 '''
 class VLAwareQNode(QNode):
     def __init__(self, name: str = None, apps: List[Application] = None):
         super().__init__(name, apps)
-        self.trans_registry: Dict[str, Transmit] = {}
-        self.session_registry: Dict[str, Dict[str, VLAwareQNode]] = {} # one node can manage multiple src-dst sessions, save with transmit_id
+        self.trans_registry: Registry[int, Transmit] = Registry()
+        self.session_registry: Dict[int, Dict[str, VLAwareQNode]] = {} # one node can manage multiple src-dst sessions, save with transmit_id
         self.has_vlink = False
         self.vlinks: List[Request] = []
         #self.vlink_buf = queue.Queue() # shared resource
@@ -26,11 +38,60 @@ class VLAwareQNode(QNode):
         self.vlink_buf = deque()
         self.waiting_for_vlink_buf = deque()
 
-        self.storage_log: Dict[str, Dict[str, Optional[bool]]] = {} # key: transmit id, value: epr list to store, storage progress (e.g. 1/2)
+        self.cchannel_map: Dict[VLAwareQNode, ClassicChannel] = {} # other endpoint -> classic channel
+
+        # set by the apps at install time, saves filtering self.apps on every swap
+        self.distro_app: Optional[Application] = None
+        self.maint_app: Optional[Application] = None
+
+    @property
+    def live_entries(self) -> int:
+        '''
+        Transmits this node still tracks, stays bounded over a run since finished entries are evicted
+        '''
+        return len(self.trans_registry)
+
+    def add_cchannel(self, cchannel: ClassicChannel):
+        super().add_cchannel(cchannel)
+        for node in cchannel.node_list: # index both directions once the channel connects two nodes
+            if node is not self and isinstance(node, VLAwareQNode):
+                node.cchannel_map[self] = cchannel
+                self.cchannel_map[node] = cchannel
+
+    def get_cchannel(self, dst: QNode) -> Optional[ClassicChannel]:
+        '''
+        O(1) lookup, the network connects the nodes on first use if they have no classic channel yet
+        '''
+        cchannel = self.cchannel_map.get(dst)
+        if cchannel is None and hasattr(self.network, 'connect_cchannel'):
+            cchannel = self.network.connect_cchannel(self, dst)
+        return cchannel
 
     def add_vlink(self, vlink: Request):
         self.vlinks.append(vlink)
 
+    def reset(self):
+        '''
+        Drop all run state (registries, buffers, stored qubits, requests) but keep channels, memories, apps and vlinks
+        '''
+        self.trans_registry.clear()
+        self.session_registry.clear()
+        self.vlink_buf.clear()
+        self.waiting_for_vlink_buf.clear()
+        self.requests.clear()
+
+        for memory in self.memories:
+            memory._storage = [None] * memory.capacity if memory.capacity > 0 else []
+            memory._store_time = [None] * memory.capacity if memory.capacity > 0 else []
+            memory._usage = 0
+        for entity in [self] + self.memories + self.qchannels + self.cchannels + self.operators:
+            entity._is_installed = False # install again with the next simulator
+        for app in self.apps:
+            if hasattr(app, 'reset'):
+                app.reset()
+            if hasattr(app, 'wait_rehandle_event_list'): # NodeProcessDelayApp
+                app.wait_rehandle_event_list.clear()
+
     @property
     def index(self) -> int:
         match = re.search(r'n(\d+)', self.name)
@@ -39,20 +100,40 @@ class VLAwareQNode(QNode):
         else:
             raise ValueError(f'Label \'{self.name}\' does not match expected format')
 
-@dataclass
+class IdAllocator:
+    '''
+    Monotonic integer ids for sessions, transmits and eprs of one simulation run.
+    Runs with the same seed get the same ids.
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._counter = itertools.count()
+
+    def next(self) -> int:
+        return next(self._counter)
+
+    def name(self, prefix: str = 'e') -> str:
+        '''
+        String view of a new id, qubit names must be str since QuantumMemory treats int keys as slot indices
+        '''
+        return f'{prefix}{next(self._counter)}'
+
+@dataclass(slots=True)
 class EprAccount:
-    transmit_id: str = None
-    session_id: str = None
+    transmit_id: int = None
+    session_id: int = None
     name: str = None
     src: VLAwareQNode = None # for retrieving transmit data when physically transmitting qubits
     dst: VLAwareQNode = None
     locA: Optional[VLAwareQNode] = None 
     locB: Optional[VLAwareQNode] = None
 
-@dataclass
+@dataclass(slots=True) # eq/hash below are kept by dataclass, only the id counts
 class Transmit:
-    id: str
-    session: str
+    id: int
+    session: int
     src: VLAwareQNode
     dst: VLAwareQNode
     alice: Optional[EprAccount] = None # points backward 